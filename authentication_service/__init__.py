@@ -1,9 +1,17 @@
 from flask import Flask
 from shared.config import Config
 from flasgger import Swagger
+from shared.log import init_app as init_logging
+from shared.tracing import init_app as init_tracing
+from shared.health import init_app as init_health
+from shared.capture import init_app as init_capture
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
 swagger = Swagger(app)
+init_logging(app)
+init_tracing(app, "authentication_service")
+readiness = init_health(app, "authentication_service")
+init_capture(app, "authentication_service")
 
 from . import routes
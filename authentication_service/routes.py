@@ -1,8 +1,10 @@
 from flask import request, jsonify
 import jwt
 import datetime
+import time
 from shared.config import Config
-from . import app
+from . import app, readiness
+from .utils import signer
 
 @app.route("/")
 def home():
@@ -66,6 +68,107 @@ def generate_token():
     token = jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
     return jsonify({"access_token": token}), 200
 
+@app.route("/generate_tokens", methods=["POST"])
+def generate_tokens():
+    """
+    Generate JWT tokens in bulk.
+    ---
+    tags:
+      - Authentication Service
+    summary: Generate many JWT tokens (Admin only)
+    description: >
+      Sign one token per email/role pair in a single call, for load tests and service-account
+      provisioning. Only roles listed in TOKEN_BATCH_ROLES (by default just `User`) can be requested.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        default: "Bearer "
+        description: Bearer token of an admin
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            users:
+              type: array
+              items:
+                type: object
+                properties:
+                  email:
+                    type: string
+                    example: "user@example.com"
+                  role:
+                    type: string
+                    example: "User"
+          required:
+            - users
+    responses:
+      200:
+        description: Tokens generated successfully, in request order
+        schema:
+          type: object
+          properties:
+            tokens:
+              type: array
+              items:
+                type: string
+            count:
+              type: integer
+              example: 1000
+            tokens_per_second:
+              type: number
+              example: 95000.0
+      400:
+        description: Missing users list, a pair without email or role, a role that can't be requested, or too many pairs
+        schema:
+          type: object
+          properties:
+            message:
+              type: string
+              example: "Email and role are required (item 3)"
+      401:
+        description: Missing or invalid token
+      403:
+        description: The caller is not an admin
+    """
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    if not token:
+        return jsonify({"message": "Token is missing"}), 401
+    try:
+        caller = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid or expired token"}), 401
+    if caller.get("role") != "Admin":
+        return jsonify({"message": "Unauthorized action: Admins only"}), 403
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("users")
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "A non-empty users list is required"}), 400
+    if len(items) > Config.TOKEN_BATCH_LIMIT:
+        return jsonify({"message": f"At most {Config.TOKEN_BATCH_LIMIT} tokens per request"}), 400
+
+    claims = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("email") or not item.get("role"):
+            return jsonify({"message": f"Email and role are required (item {position})"}), 400
+        if item["role"] not in Config.TOKEN_BATCH_ROLES:
+            return jsonify({"message": f"Role {item['role']!r} can't be requested (item {position})"}), 400
+        claims.append((item["email"], item["role"]))
+
+    started = time.perf_counter()
+    tokens = signer.sign_batch(claims)
+    elapsed = time.perf_counter() - started
+    return jsonify({
+        "tokens": tokens,
+        "count": len(tokens),
+        "tokens_per_second": round(len(tokens) / elapsed, 1) if elapsed > 0 else None,
+    }), 200
+
 @app.route("/validate", methods=["GET"])
 def validate():
     """
@@ -118,3 +221,10 @@ def validate():
         return jsonify({"message": "Token has expired"}), 401
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
+
+
+@readiness.add_warmer
+def warm_token_signing():
+    # Prime JWT signing and decoding so the first logins don't pay for it
+    token = signer.sign({"email": "warmup", "role": "warmup", "exp": int(time.time()) + 60})
+    jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
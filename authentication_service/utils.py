@@ -1,5 +1,10 @@
 import jwt
 import datetime
+import hashlib
+import hmac
+import json
+import time
+from jwt.utils import base64url_encode
 from shared.config import Config
 
 def generate_token(email, role):
@@ -17,3 +22,34 @@ def validate_token(token):
         return {"message": "Token has expired"}
     except jwt.InvalidTokenError:
         return {"message": "Invalid token"}
+
+
+class TokenSigner:
+    """
+    HS256 JWT signer that does the per-key work once: the encoded JOSE header is
+    reused for every token and the HMAC key schedule is computed up front, so each
+    token only costs a copy of the keyed hash state plus the payload hashing.
+    Produces the same tokens as jwt.encode(..., algorithm="HS256").
+    """
+
+    def __init__(self, secret):
+        header = json.dumps({"typ": "JWT", "alg": "HS256"}, separators=(",", ":")).encode()
+        self._header_segment = base64url_encode(header) + b"."
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+    def sign(self, payload):
+        body = base64url_encode(json.dumps(payload, separators=(",", ":")).encode())
+        signing_input = self._header_segment + body
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return (signing_input + b"." + base64url_encode(mac.digest())).decode()
+
+    def sign_batch(self, claims, lifetime=datetime.timedelta(hours=1)):
+        """
+        Sign one token per (email, role) pair, all expiring `lifetime` from now.
+        """
+        exp = int(time.time() + lifetime.total_seconds())
+        return [self.sign({"email": email, "role": role, "exp": exp}) for email, role in claims]
+
+
+signer = TokenSigner(Config.SECRET_KEY)
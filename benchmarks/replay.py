@@ -0,0 +1,182 @@
+"""
+Replay captured traffic against the services and report latency distributions.
+
+Capture traffic by running the services with CAPTURE_FILE=<path>. The replayer sends the
+captured requests to the configured service URLs with their original spacing, divided
+by --rate (2 replays twice as fast, 0 sends as fast as the workers allow). At most
+--concurrency requests are in flight at once.
+
+Secrets are scrubbed from captures, so requests that carried a token are replayed
+with one from logging in as --email/--password, and scrubbed passwords are replaced
+with --password. Bodies that weren't JSON are not captured and are replayed empty. Calls services made to each other are skipped, since replaying the
+client request that caused them makes them again; pass --include-internal to keep them.
+
+Usage: python -m benchmarks.replay capture.jsonl [--rate 1] [--concurrency 8] [--start-services]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from shared.capture import REDACTED
+from shared.config import Config
+from shared import upstream
+
+SERVICE_URLS = {
+    "user_service": Config.USER_SERVICE_URL,
+    "authentication_service": Config.AUTH_SERVICE_URL,
+    "destination_service": Config.DESTINATION_SERVICE_URL,
+}
+
+
+def load_capture(path, include_internal=False):
+    records = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if include_internal or "X-Caller-Service" not in record["headers"]:
+                    records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def restore_secrets(value, password):
+    if isinstance(value, dict):
+        return {
+            key: password if key == "password" and item == REDACTED else restore_secrets(item, password)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [restore_secrets(item, password) for item in value]
+    return value
+
+
+def login(email, password):
+    url = f"{Config.USER_SERVICE_URL}/login"
+    send = upstream.session.post if url.startswith("http+unix://") else requests.post
+    response = send(url, json={"email": email, "password": password}, timeout=10)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def prepare(record, token, password):
+    """
+    Turn a captured record into (method, url, keyword arguments for requests).
+    """
+    headers = {key: value for key, value in record["headers"].items() if key != "X-Caller-Service"}
+    if headers.get("Authorization") == REDACTED:
+        headers["Authorization"] = f"Bearer {token}"
+    url = SERVICE_URLS[record["service"]] + record["path"]
+    if record["query"]:
+        url += "?" + record["query"]
+    kwargs = {"headers": headers, "timeout": 30}
+    if "json" in record:
+        kwargs["data"] = json.dumps(restore_secrets(record["json"], password))
+    return record["method"], url, kwargs
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_changed = defaultdict(int)
+        self.lag = []
+        self._lock = threading.Lock()
+
+    def add(self, key, latency_ms, error, status_changed, lag_ms):
+        with self._lock:
+            self.latencies[key].append(latency_ms)
+            self.errors[key] += error
+            self.status_changed[key] += status_changed
+            self.lag.append(lag_ms)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def replay(records, token, password, rate, concurrency):
+    results = Results()
+    slots = threading.BoundedSemaphore(concurrency)
+    session = requests.Session()
+    session.mount("http+unix://", upstream.session.get_adapter("http+unix://"))
+
+    def send(record, due):
+        try:
+            method, url, kwargs = prepare(record, token, password)
+            started = time.perf_counter()
+            lag_ms = (started - due) * 1000
+            try:
+                status = session.request(method, url, **kwargs).status_code
+            except requests.exceptions.RequestException:
+                status = None
+            latency_ms = (time.perf_counter() - started) * 1000
+            key = f"{record['method']} {record['service']}.{record['endpoint'] or record['path']}"
+            results.add(key, latency_ms, status is None or status >= 500, status != record["status"], lag_ms)
+        finally:
+            slots.release()
+
+    first_ts = records[0]["ts"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            due = started + ((record["ts"] - first_ts) / rate if rate > 0 else 0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            pool.submit(send, record, due)
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed):
+    total = sum(len(values) for values in results.latencies.values())
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)")
+    print(f"{'endpoint':<52} {'count':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} {'changed':>8}")
+    for key in sorted(results.latencies):
+        values = sorted(results.latencies[key])
+        print(
+            f"{key:<52} {len(values):>6} {statistics.median(values):>8.2f} {percentile(values, 0.9):>8.2f} "
+            f"{percentile(values, 0.99):>8.2f} {values[-1]:>8.2f} {results.errors[key]:>7} {results.status_changed[key]:>8}"
+        )
+    lag = sorted(results.lag)
+    print(f"schedule lag: p50 {statistics.median(lag):.2f}ms, p99 {percentile(lag, 0.99):.2f}ms")
+    print("'changed' counts responses whose status differs from the captured one")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture")
+    parser.add_argument("--rate", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--email", default="masteradmin@example.com")
+    parser.add_argument("--password", default="Master@123")
+    parser.add_argument("--include-internal", action="store_true")
+    parser.add_argument("--start-services", action="store_true", help="start the services in this process first")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture, args.include_internal)
+    if not records:
+        parser.error(f"No requests to replay in {args.capture}")
+    if args.start_services:
+        from travel_api import start_services
+        from authentication_service import app as auth_app
+        from destination_service import app as destination_app
+        from user_service import app as user_app
+        start_services([
+            (user_app, Config.USER_SERVICE_URL, None),
+            (auth_app, Config.AUTH_SERVICE_URL, None),
+            (destination_app, Config.DESTINATION_SERVICE_URL, None),
+        ])
+
+    token = login(args.email, args.password)
+    results, elapsed = replay(records, token, args.password, args.rate, args.concurrency)
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
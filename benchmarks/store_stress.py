@@ -0,0 +1,124 @@
+"""
+Concurrency stress benchmark for the destination store.
+
+Reader threads repeatedly project the whole catalog the way GET /destinations
+does, first with no writers and then while writer threads keep publishing new
+versions. The copy-on-write store is compared with a plain dict behind a lock.
+The cost of one write with no readers running is reported as well: under load,
+writers mostly wait for the GIL held by readers that never block on a lock.
+
+Usage: python -m benchmarks.store_stress [--readers 4] [--writers 2] [--seconds 2] [--size 1000]
+"""
+import argparse
+import threading
+import time
+import timeit
+from destination_service.models import DestinationStore
+
+
+def make_catalog(size):
+    return {
+        f"D{i:06d}": {
+            "id": f"D{i:06d}",
+            "name": f"Destination {i}",
+            "description": "Benchmark destination",
+            "location": "Nowhere",
+            "price_per_night": 100.0 + i % 50,
+        }
+        for i in range(size)
+    }
+
+
+def project(records):
+    return [{key: value for key, value in dest.items() if key != "id"} for dest in records.values()]
+
+
+class CopyOnWrite:
+    name = "copy-on-write"
+
+    def __init__(self, catalog):
+        self.store = DestinationStore(catalog)
+
+    def read(self):
+        return project(self.store.snapshot().records)
+
+    def write(self, destination_id, price):
+        with self.store.update() as records:
+            records[destination_id] = dict(records[destination_id], price_per_night=price)
+
+
+class Locked:
+    name = "locked dict"
+
+    def __init__(self, catalog):
+        self.records = dict(catalog)
+        self.lock = threading.Lock()
+
+    def read(self):
+        with self.lock:
+            return project(self.records)
+
+    def write(self, destination_id, price):
+        with self.lock:
+            self.records[destination_id] = dict(self.records[destination_id], price_per_night=price)
+
+
+def run(store, size, readers, writers, seconds, write_interval):
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0] * writers
+    errors = []
+
+    def reader(slot):
+        while not stop.is_set():
+            if len(store.read()) != size:
+                errors.append("inconsistent snapshot")
+            reads[slot] += 1
+
+    def writer(slot):
+        i = 0
+        while not stop.is_set():
+            store.write(f"D{(slot + i * writers) % size:06d}", float(i))
+            writes[slot] += 1
+            i += 1
+            time.sleep(write_interval)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads) / seconds, sum(writes) / seconds, len(errors)
+
+
+def write_cost(store, size, number=1000):
+    """
+    Microseconds per write with no other threads running.
+    """
+    return timeit.timeit(lambda: store.write(f"D{size // 2:06d}", 1.0), number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--write-interval", type=float, default=0.001)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.size)
+    print(f"{args.readers} readers, {args.writers} writers, {args.size} destinations, {args.seconds}s per run")
+    print(f"{'store':<15} {'idle reads/s':>13} {'loaded reads/s':>15} {'writes/s':>9} {'write us':>9} {'retained':>9} {'errors':>7}")
+    for kind in (CopyOnWrite, Locked):
+        idle, _, _ = run(kind(catalog), args.size, args.readers, 0, args.seconds, args.write_interval)
+        loaded, write_rate, errors = run(kind(catalog), args.size, args.readers, args.writers, args.seconds, args.write_interval)
+        cost = write_cost(kind(catalog), args.size)
+        print(f"{kind.name:<15} {idle:>13.0f} {loaded:>15.0f} {write_rate:>9.0f} {cost:>9.1f} {loaded / idle:>9.0%} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
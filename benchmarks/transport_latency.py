@@ -0,0 +1,87 @@
+"""
+Latency of the per-request auth hop over loopback TCP and over a Unix domain socket.
+
+The Authentication Service is served on a free TCP port and on a Unix socket at the
+same time, and GET /validate is called sequentially through each one, both with a
+new connection per call (as plain requests.get does) and over a keep-alive pool.
+
+Usage: python -m benchmarks.transport_latency [--requests 2000]
+"""
+import argparse
+import logging
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+import requests
+from werkzeug.serving import make_server
+from authentication_service import app
+from authentication_service.utils import generate_token
+from shared.upstream import session as upstream_session
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def serve(host, port):
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(send, url, headers, count):
+    send(url, headers=headers).raise_for_status()
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        send(url, headers=headers)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return statistics.mean(timings), timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "auth.sock")
+    port = free_port()
+    servers = [serve("localhost", port), serve(f"unix://{socket_path}", 0)]
+    tcp_url = f"http://localhost:{port}/validate"
+    unix_url = f"http+unix://{quote(socket_path, safe='')}/validate"
+    headers = {"Authorization": f"Bearer {generate_token('bench@example.com', 'User')}"}
+    tcp_session = requests.Session()
+
+    def new_unix_connection(url, **kwargs):
+        # Drop pooled connections so every call opens a fresh socket, like requests.get over TCP
+        upstream_session.get_adapter(url).close()
+        return upstream_session.get(url, **kwargs)
+
+    runs = [
+        ("tcp, new connection", requests.get, tcp_url),
+        ("uds, new connection", new_unix_connection, unix_url),
+        ("tcp, keep-alive", tcp_session.get, tcp_url),
+        ("uds, keep-alive", upstream_session.get, unix_url),
+    ]
+    print(f"{args.requests} sequential GET /validate calls per transport")
+    print(f"{'transport':<22} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+    try:
+        for name, send, url in runs:
+            mean, p50, p99 = measure(send, url, headers, args.requests)
+            print(f"{name:<22} {mean:>9.0f} {p50:>9.0f} {p99:>9.0f}")
+    finally:
+        for server in servers:
+            server.shutdown()
+        os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 from flask import Flask
 from shared.config import Config
 from flasgger import Swagger
+from shared.log import init_app as init_logging
+from shared.tracing import init_app as init_tracing
+from shared.health import init_app as init_health
+from shared.capture import init_app as init_capture
 
 app = Flask(__name__)
 app.config['SWAGGER'] = {
@@ -8,5 +12,9 @@ app.config['SWAGGER'] = {
     'uiversion': 3
 }
 swagger = Swagger(app)
+init_logging(app)
+init_tracing(app, "destination_service")
+readiness = init_health(app, "destination_service")
+init_capture(app, "destination_service")
 
 from . import routes
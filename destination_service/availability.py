@@ -0,0 +1,152 @@
+import datetime
+import threading
+import numpy as np
+from shared.config import Config
+from .models import store
+
+
+class AvailabilityError(Exception):
+    pass
+
+
+class Unavailable(AvailabilityError):
+    pass
+
+
+class Availability:
+    """
+    Booked nights per destination as packed bitsets, one row of a uint8 matrix per
+    destination and one bit per night from `origin`. Stays can be booked from today
+    for `days` nights. As days pass the bitsets roll forward a byte at a time, so past
+    nights drop off and the window keeps its length. Row 0 is never booked and stands
+    in for destinations that have no row yet.
+    """
+
+    def __init__(self, days=None, today=None):
+        self.days = days or Config.AVAILABILITY_DAYS
+        self._today = today or datetime.date.today
+        self.origin = self._today()
+        # One spare byte: the window can start up to 7 nights into the first byte before it rolls
+        self._bits = np.zeros((16, (self.days + 7) // 8 + 1), dtype=np.uint8)
+        self._rows = {}
+        self._free_rows = []
+        self._next_row = 1
+        self._positions = None
+        self._lock = threading.Lock()
+
+    @property
+    def start(self):
+        """
+        First bookable night.
+        """
+        return self._today()
+
+    def _roll(self):
+        # Under the lock: drop whole bytes of past nights and start the window's bytes at 0
+        shift = (self._today() - self.origin).days // 8
+        if shift > 0:
+            width = self._bits.shape[1]
+            kept = self._bits[:, min(shift, width):]
+            padding = np.zeros((len(self._bits), width - kept.shape[1]), dtype=np.uint8)
+            self._bits = np.concatenate((kept, padding), axis=1)
+            self.origin += datetime.timedelta(days=8 * shift)
+
+    def nights(self, check_in, check_out):
+        """
+        Turn ISO check-in/check-out dates into a [first, last) range of night indices
+        from `origin`. Called under the lock, after _roll().
+        """
+        try:
+            first = datetime.date.fromisoformat(check_in)
+            last = datetime.date.fromisoformat(check_out)
+        except (TypeError, ValueError):
+            raise AvailabilityError("check_in and check_out must be ISO dates (YYYY-MM-DD)")
+        if last <= first:
+            raise AvailabilityError("check_out must be after check_in")
+        today = self._today()
+        end = today + datetime.timedelta(days=self.days)
+        if first < today or last > end:
+            raise AvailabilityError(f"Stays must fall between {today} and {end}")
+        return (first - self.origin).days, (last - self.origin).days
+
+    def _row(self, destination_id):
+        row = self._rows.get(destination_id)
+        if row is None:
+            if self._free_rows:
+                row = self._rows[destination_id] = self._free_rows.pop()
+                return row
+            row = self._rows[destination_id] = self._next_row
+            self._next_row += 1
+            if row == len(self._bits):
+                self._bits = np.concatenate((self._bits, np.zeros_like(self._bits)))
+        return row
+
+    def forget(self, destination_ids):
+        """
+        Drop the bookings of deleted destinations and free their rows for reuse.
+        """
+        with self._lock:
+            for destination_id in destination_ids:
+                row = self._rows.pop(destination_id, None)
+                if row is not None:
+                    self._bits[row] = 0
+                    self._free_rows.append(row)
+                    self._positions = None
+
+    def on_catalog_change(self, previous, current, upserted, deleted):
+        if deleted:
+            self.forget(deleted)
+
+    def book(self, destination_id, check_in, check_out):
+        """
+        Reserve every night of the stay, or none of them. Raises Unavailable if any
+        night is already booked. Returns the number of nights booked.
+        """
+        with self._lock:
+            self._roll()
+            first, last = self.nights(check_in, check_out)
+            row = self._row(destination_id)
+            nights = np.unpackbits(self._bits[row])
+            if nights[first:last].any():
+                raise Unavailable("Destination is not available for these dates")
+            nights[first:last] = 1
+            self._bits[row] = np.packbits(nights)
+        return last - first
+
+    def booked_nights(self, destination_id):
+        with self._lock:
+            self._roll()
+            row = self._rows.get(destination_id, 0)
+            nights = np.unpackbits(self._bits[row])
+            origin, past = self.origin, (self._today() - self.origin).days
+        return [str(origin + datetime.timedelta(days=int(day))) for day in np.flatnonzero(nights) if day >= past]
+
+    def _rows_for(self, columns):
+        # Rows in PriceColumns order, rebuilt for a new catalog version or after rows were freed
+        if self._positions is None or self._positions[0] is not columns:
+            rows = np.fromiter((self._row(key) for key in columns.ids.tolist()), dtype=np.int64, count=len(columns.ids))
+            self._positions = (columns, rows)
+        return self._positions[1]
+
+    def search(self, columns, check_in, check_out, max_price=None):
+        """
+        Column positions of the destinations free for every night of the stay and
+        priced at most `max_price` per night, cheapest first.
+        """
+        candidates = np.arange(len(columns.ids))
+        if max_price is not None:
+            candidates = np.flatnonzero(columns.prices <= max_price)
+
+        with self._lock:
+            self._roll()
+            first, last = self.nights(check_in, check_out)
+            # Only the bytes covering the stay are unpacked, for every candidate at once
+            low, high = first // 8, (last + 7) // 8
+            rows = self._rows_for(columns)[candidates]
+            window = np.unpackbits(self._bits[rows, low:high], axis=1)
+        free = candidates[~window[:, first - 8 * low:last - 8 * low].any(axis=1)]
+        return free[np.argsort(columns.prices[free], kind="stable")]
+
+
+availability = Availability()
+store.add_listener(availability.on_catalog_change)
@@ -0,0 +1,97 @@
+import math
+from numbers import Number
+from shared.config import Config
+from .projection import FIELDS
+
+UPDATABLE_FIELDS = FIELDS[1:]
+TEXT_FIELDS = ("name", "description", "location")
+
+
+class BatchError(Exception):
+    def __init__(self, message, index=None):
+        super().__init__(message if index is None else f"Operation {index}: {message}")
+        self.index = index
+
+
+def _check_price(value):
+    if isinstance(value, bool) or not isinstance(value, Number) or not math.isfinite(value) or value < 0:
+        raise ValueError("price_per_night must be a non-negative number")
+
+
+def _check_id(value):
+    if not isinstance(value, str):
+        raise ValueError("id must be a string")
+
+
+def check_fields(fields):
+    """
+    Validate destination fields, a whole record or just the changes to one: the ID and the
+    text fields must be strings and the price a finite, non-negative number.
+    Raises ValueError for the first bad field.
+    """
+    for field, value in fields.items():
+        if field == "id":
+            _check_id(value)
+        elif field == "price_per_night":
+            _check_price(value)
+        elif field in TEXT_FIELDS and not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+
+
+def _apply(records, operation):
+    if not isinstance(operation, dict):
+        raise ValueError("must be an object")
+    op = operation.get("op")
+
+    if op == "create":
+        destination = operation.get("destination")
+        if not isinstance(destination, dict) or not all(field in destination for field in FIELDS):
+            raise ValueError("Missing required fields")
+        check_fields(destination)
+        if destination["id"] in records:
+            raise ValueError("Destination ID already exists")
+        records[destination["id"]] = {field: destination[field] for field in FIELDS}
+
+    elif op == "update":
+        destination_id, changes = operation.get("id"), operation.get("changes")
+        _check_id(destination_id)
+        if destination_id not in records:
+            raise ValueError("Destination not found")
+        if not isinstance(changes, dict) or not changes:
+            raise ValueError("changes must be a non-empty object")
+        unknown = set(changes).difference(UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update: {', '.join(sorted(unknown))}")
+        check_fields(changes)
+        records[destination_id] = {**records[destination_id], **changes}
+
+    elif op == "delete":
+        _check_id(operation.get("id"))
+        if operation["id"] not in records:
+            raise ValueError("Destination not found")
+        del records[operation["id"]]
+
+    else:
+        raise ValueError("op must be one of create, update, delete")
+    return op
+
+
+def apply_batch(records, operations):
+    """
+    Apply create/update/delete operations in order to a catalog dict.
+    Raises BatchError on the first invalid operation; callers apply batches to a private
+    copy of the catalog, so a failed batch leaves nothing behind.
+    Returns a count of applied operations per op.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("operations must be a non-empty list")
+    if len(operations) > Config.DESTINATION_BATCH_LIMIT:
+        raise BatchError(f"At most {Config.DESTINATION_BATCH_LIMIT} operations per batch")
+
+    counts = {"create": 0, "update": 0, "delete": 0}
+    for index, operation in enumerate(operations):
+        try:
+            counts[_apply(records, operation)] += 1
+        except ValueError as e:
+            raise BatchError(str(e), index)
+    return counts
@@ -0,0 +1,196 @@
+import csv
+import json
+import logging
+import mmap
+import os
+import threading
+from shared.config import Config
+from . import models
+from .batch import check_fields
+from .models import catalog_for_update
+from .shared_catalog import CatalogTooLarge
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("id", "name", "description", "location", "price_per_night")
+
+
+class CatalogFileError(Exception):
+    pass
+
+
+def _lines(mapped):
+    # Stream lines straight out of the mapping without reading the file into memory first
+    return iter(mapped.readline, b"")
+
+
+def _records_from_csv(mapped):
+    reader = csv.DictReader(line.decode("utf-8") for line in _lines(mapped))
+    missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise CatalogFileError(f"CSV header is missing: {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _records_from_json_lines(mapped):
+    for line_number, line in enumerate(_lines(mapped), start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                raise CatalogFileError(f"Line {line_number}: {e}")
+
+
+def _records_from_json(mapped):
+    try:
+        records = json.loads(mapped[:])
+    except ValueError as e:
+        raise CatalogFileError(f"Invalid JSON: {e}")
+    if not isinstance(records, list):
+        raise CatalogFileError("A JSON catalog must be an array of destinations")
+    for position, record in enumerate(records, start=1):
+        yield position, record
+
+
+PARSERS = {
+    ".csv": _records_from_csv,
+    ".jsonl": _records_from_json_lines,
+    ".ndjson": _records_from_json_lines,
+    ".json": _records_from_json,
+}
+
+
+def load_catalog(path):
+    """
+    Parse a catalog file into a dict keyed by destination ID.
+    CSV and JSON Lines files are streamed record by record from a memory mapping;
+    a .json file holds a single array of destinations.
+    """
+    parser = PARSERS.get(os.path.splitext(path)[1].lower())
+    if parser is None:
+        raise CatalogFileError(f"Unsupported catalog file type: {path}")
+
+    catalog = {}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return catalog
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            try:
+                for position, record in parser(mapped):
+                    try:
+                        destination_id = str(record["id"])
+                        destination = {
+                            "id": destination_id,
+                            "name": record["name"],
+                            "description": record["description"],
+                            "location": record["location"],
+                            "price_per_night": float(record["price_per_night"]),
+                        }
+                    except (KeyError, TypeError, ValueError) as e:
+                        raise CatalogFileError(f"Record {position}: invalid or missing {e}")
+                    try:
+                        # Short CSV rows and JSON nulls leave fields as None; NaN and inf parse as floats
+                        check_fields(destination)
+                    except ValueError as e:
+                        raise CatalogFileError(f"Record {position}: {e}")
+                    catalog[destination_id] = destination
+            except csv.Error as e:
+                raise CatalogFileError(f"Invalid CSV: {e}")
+            except UnicodeDecodeError as e:
+                raise CatalogFileError(f"Not UTF-8: {e}")
+    return catalog
+
+
+def sync_records(records, new_records):
+    """
+    Make the `records` dict match `new_records` in place, touching only what differs.
+    Returns (added, updated, removed) counts.
+    """
+    removed = [key for key in records if key not in new_records]
+    for key in removed:
+        del records[key]
+    added = updated = 0
+    for key, record in new_records.items():
+        current = records.get(key)
+        if current is None:
+            added += 1
+        elif current == record:
+            continue
+        else:
+            updated += 1
+        records[key] = record
+    return added, updated, len(removed)
+
+
+def apply_catalog(new_records):
+    """
+    Make the live catalog match `new_records` and publish the result as one new
+    version (one per shard when the catalog is sharded). Returns (added, updated, removed) counts.
+    """
+    if models.sharded_catalog is not None:
+        return models.sharded_catalog.replace(new_records)
+    with catalog_for_update() as records:
+        return sync_records(records, new_records)
+
+
+class CatalogFileWatcher:
+    """
+    Reload the catalog whenever its file changes. The file is the source of truth:
+    destinations missing from it are removed on the next reload.
+    """
+
+    def __init__(self, path, interval=None):
+        self.path = path
+        self.interval = interval or Config.CATALOG_WATCH_INTERVAL
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """
+        Reload if the file changed since it was last read. Returns True if it reloaded.
+        A file that fails to parse or apply leaves the last good catalog in place, and
+        isn't read again until it changes.
+        """
+        try:
+            signature = self._stat_signature()
+        except OSError as e:
+            logger.warning("Catalog file unavailable: %s", e)
+            return False
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            added, updated, removed = apply_catalog(load_catalog(self.path))
+        except (CatalogFileError, CatalogTooLarge, OSError, ValueError) as e:
+            logger.error("Catalog reload from %s failed: %s", self.path, e)
+            return False
+        logger.info(
+            "Catalog reloaded from %s", self.path,
+            extra={"fields": {"added": added, "updated": updated, "removed": removed}},
+        )
+        return True
+
+    def start(self):
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # Keep watching: the next change to the file may well load
+                logger.exception("Catalog watcher check failed for %s", self.path)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,121 @@
+import json
+import queue
+import threading
+from shared.config import Config
+from .models import store
+
+
+class Subscriber:
+    def __init__(self, buffer_size, include_ids):
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.include_ids = include_ids
+        self.closed = False
+
+
+class Broadcaster:
+    """
+    Fan catalog change events out to SSE subscribers.
+    Each subscriber has a bounded buffer; one that falls behind is disconnected
+    instead of letting its backlog grow. It can resume with GET /destinations?since=.
+    """
+
+    def __init__(self, buffer_size=None):
+        self.buffer_size = buffer_size or Config.STREAM_BUFFER_SIZE
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.disconnected = 0
+
+    def subscribe(self, include_ids=True):
+        subscriber = Subscriber(self.buffer_size, include_ids)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                self._disconnect(subscriber)
+
+    def _disconnect(self, subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            self.disconnected += 1
+        subscriber.closed = True
+        # Make room for the sentinel that ends the subscriber's stream
+        while True:
+            try:
+                subscriber.queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            subscriber.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def on_catalog_change(self, previous, current, upserted, deleted):
+        """
+        Store listener: one event per added, updated or deleted destination.
+        """
+        for key in upserted:
+            event_type = "update" if key in previous.records else "add"
+            self.publish({"type": event_type, "version": current.version, "destination": current.records[key]})
+        for key in deleted:
+            self.publish({"type": "delete", "version": current.version, "id": key})
+
+    def stream(self, subscriber):
+        """
+        Generate the SSE wire format for one subscriber until it disconnects.
+        """
+        try:
+            yield ": connected\n\n"
+            while not subscriber.closed:
+                try:
+                    event = subscriber.queue.get(timeout=Config.STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_event(event, subscriber.include_ids)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            published, disconnected = self.published, self.disconnected
+        backlogs = [subscriber.queue.qsize() for subscriber in subscribers]
+        return {
+            "subscribers": len(subscribers),
+            "backlog": sum(backlogs),
+            "max_backlog": max(backlogs, default=0),
+            "buffer_size": self.buffer_size,
+            "published": published,
+            "disconnected": disconnected,
+        }
+
+
+def format_event(event, include_ids):
+    data = dict(event)
+    if not include_ids:
+        # Regular users never see destination IDs
+        data.pop("id", None)
+        if "destination" in data:
+            data["destination"] = {key: value for key, value in data["destination"].items() if key != "id"}
+    return f"id: {event['version']}\nevent: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+
+broadcaster = Broadcaster()
+store.add_listener(broadcaster.on_catalog_change)
@@ -1,8 +1,164 @@
-# In-memory data store for destinations
-destinations = {}
+import threading
+from collections import deque
+from contextlib import contextmanager
+from types import MappingProxyType
+from shared.config import Config
+
+
+class Snapshot:
+    """
+    One immutable version of the catalog. Records are never modified in place;
+    writers replace them, so a snapshot stays consistent for as long as it is held.
+    `changes` holds the (version, upserted IDs, deleted IDs) entries of the most
+    recent versions, oldest first.
+    """
+    __slots__ = ("version", "records", "changes")
+
+    def __init__(self, version, records, changes=()):
+        self.version = version
+        self.records = MappingProxyType(records)
+        self.changes = changes
+
+    def delta(self, since):
+        """
+        Return (upserted records, deleted IDs) between version `since` and this snapshot,
+        or None if `since` is unknown or older than the retained change log.
+        """
+        if since == self.version:
+            return [], []
+        if since > self.version or not self.changes or since < self.changes[0][0] - 1:
+            return None
+
+        touched = {}
+        for version, upserted, deleted in self.changes:
+            if version > since:
+                touched.update(dict.fromkeys(upserted))
+                touched.update(dict.fromkeys(deleted))
+        upserts = [self.records[key] for key in touched if key in self.records]
+        tombstones = [key for key in touched if key not in self.records]
+        return upserts, tombstones
+
+
+class _TrackedRecords(dict):
+    """
+    The records dict handed to writers. It notes every key they set or delete, so the
+    next version is diffed on those keys only instead of the whole catalog.
+    """
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.touched = {}
+
+    def __setitem__(self, key, value):
+        self.touched[key] = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.touched[key] = None
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *default):
+        self.touched[key] = None
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.touched[key] = None
+        return key, value
+
+    def setdefault(self, key, default=None):
+        self.touched[key] = None
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self.touched.update(dict.fromkeys(self))
+        super().clear()
+
+
+class DestinationStore:
+    """
+    Copy-on-write destination catalog.
+    Readers take the current snapshot with a single attribute read and never lock.
+    Writers serialize on a lock, build the next version from a copy and publish
+    it by swapping the snapshot reference. Only the keys a writer touched are
+    compared with the previous version.
+    """
+
+    def __init__(self, records=None, changelog_size=None):
+        self._snapshot = Snapshot(0, dict(records or {}))
+        self._write_lock = threading.Lock()
+        self._written = threading.local()
+        self._listeners = []
+        # Published versions waiting for their listeners, delivered in order outside the write lock
+        self._pending = deque()
+        self._notify_lock = threading.Lock()
+        self.changelog_size = changelog_size or Config.CATALOG_CHANGELOG_SIZE
+
+    def snapshot(self):
+        return self._snapshot
+
+    def add_listener(self, listener):
+        """
+        Call listener(previous, current, upserted IDs, deleted IDs) after every new version.
+        Listeners run in version order after the write lock is released, on a writer's
+        thread, and must not block.
+        """
+        self._listeners.append(listener)
+
+    @contextmanager
+    def update(self):
+        """
+        Yield a private copy of the records; if it was changed it becomes the next version.
+        """
+        with self._write_lock:
+            current = self._snapshot
+            records = _TrackedRecords(current.records.copy())
+            yield records
+            upserted = tuple(
+                key for key in records.touched if key in records and current.records.get(key) != records[key]
+            )
+            deleted = tuple(key for key in records.touched if key not in records and key in current.records)
+            if upserted or deleted:
+                version = current.version + 1
+                # Older entries are compacted away; clients behind them get a full snapshot
+                changes = (current.changes + ((version, upserted, deleted),))[-self.changelog_size:]
+                self._snapshot = Snapshot(version, records, changes)
+                if self._listeners:
+                    self._pending.append((current, self._snapshot, upserted, deleted))
+            self._written.version = self._snapshot.version
+        self._notify()
+
+    def _notify(self):
+        # Whoever holds the notify lock delivers every pending version in order; a writer
+        # that can't take it leaves its version to the holder, which checks again after releasing
+        while self._pending and self._notify_lock.acquire(blocking=False):
+            try:
+                while self._pending:
+                    change = self._pending.popleft()
+                    for listener in self._listeners:
+                        listener(*change)
+            finally:
+                self._notify_lock.release()
+
+    def written_version(self):
+        """
+        Catalog version left by the calling thread's last update(), unaffected by later writers.
+        """
+        return self._written.version
+
 
 # Sample destination data added manually
-destinations['PAR'] = {
+sample_destinations = {}
+
+sample_destinations['PAR'] = {
     'id': 'PAR',
     'name': 'Paris',
     'description': 'The city of lights',
@@ -10,7 +166,7 @@ destinations['PAR'] = {
     'price_per_night': 200.0
 }
 
-destinations['NYC'] = {
+sample_destinations['NYC'] = {
     'id': 'NYC',
     'name': 'New York City',
     'description': 'The city that never sleeps',
@@ -18,7 +174,7 @@ destinations['NYC'] = {
     'price_per_night': 250.0
 }
 
-destinations['TOK'] = {
+sample_destinations['TOK'] = {
     'id': 'TOK',
     'name': 'Tokyo',
     'description': 'A city blending tradition with modernity',
@@ -26,7 +182,7 @@ destinations['TOK'] = {
     'price_per_night': 220.0
 }
 
-destinations['SYD'] = {
+sample_destinations['SYD'] = {
     'id': 'SYD',
     'name': 'Sydney',
     'description': 'Famous for its Sydney Opera House',
@@ -34,7 +190,7 @@ destinations['SYD'] = {
     'price_per_night': 180.0
 }
 
-destinations['RIO'] = {
+sample_destinations['RIO'] = {
     'id': 'RIO',
     'name': 'Rio de Janeiro',
     'description': 'Known for its Copacabana and Ipanema beaches',
@@ -42,10 +198,72 @@ destinations['RIO'] = {
     'price_per_night': 160.0
 }
 
-destinations['ROM'] = {
+sample_destinations['ROM'] = {
     'id': 'ROM',
     'name': 'Rome',
     'description': 'An expansive city with nearly 3,000 years of history',
     'location': 'Italy',
     'price_per_night': 210.0
 }
+
+# In-memory data store for destinations, seeded with the sample data
+store = DestinationStore(sample_destinations)
+
+# Set when worker processes serve the catalog from shared memory (see shared_catalog.py)
+shared_catalog = None
+_shared_snapshot = None
+# Set when the catalog is partitioned across shard processes (see shards.py)
+sharded_catalog = None
+
+
+def attach_shared_catalog(catalog):
+    """
+    Serve the catalog from a SharedCatalog. The creating process seeds it with the local data.
+    """
+    global shared_catalog
+    if catalog.owner:
+        catalog.publish(store.snapshot().records)
+    shared_catalog = catalog
+
+
+def attach_sharded_catalog(catalog):
+    """
+    Serve the catalog from a ShardedCatalog. The shards own the records from now on,
+    so the local store is emptied rather than kept as a stale copy.
+    """
+    global sharded_catalog
+    sharded_catalog = catalog
+    with store.update() as records:
+        records.clear()
+
+
+def current_snapshot():
+    """
+    Latest catalog snapshot, decoded from shared memory when worker processes share the catalog.
+    """
+    global _shared_snapshot
+    if shared_catalog is None:
+        return store.snapshot()
+    if _shared_snapshot is None or _shared_snapshot.version != shared_catalog.version:
+        _shared_snapshot = Snapshot(*shared_catalog.read_records())
+    return _shared_snapshot
+
+
+def written_version():
+    """
+    Catalog version produced by the calling thread's last catalog_for_update().
+    """
+    return (store if shared_catalog is None else shared_catalog).written_version()
+
+
+@contextmanager
+def catalog_for_update():
+    """
+    Yield the catalog dict to modify. In shared mode changes are published to every worker.
+    """
+    if shared_catalog is None:
+        with store.update() as records:
+            yield records
+    else:
+        with shared_catalog.writing() as records:
+            yield records
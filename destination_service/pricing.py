@@ -0,0 +1,144 @@
+import threading
+import numpy as np
+from shared.config import Config
+
+# Stays must fall between these dates so seasonal pricing can use a precomputed table
+CALENDAR_START = np.datetime64("2000-01-01", "D")
+CALENDAR_END = np.datetime64("2100-01-01", "D")
+
+
+class QuoteError(Exception):
+    pass
+
+
+def _price(record):
+    # A price that isn't a number can't be quoted; NaN marks it instead of failing the whole column
+    try:
+        return float(record["price_per_night"])
+    except (KeyError, TypeError, ValueError):
+        return np.nan
+
+
+class PriceColumns:
+    """
+    Column-packed view of one catalog snapshot: destination IDs sorted for
+    binary search, with `price_per_night` in a float64 array in the same order.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        # IDs that aren't strings can't be ordered against the rest or quoted, so they get no column
+        ids = sorted(key for key in snapshot.records if isinstance(key, str))
+        self.ids = np.array(ids, dtype=str)
+        self.prices = np.array([_price(snapshot.records[key]) for key in ids], dtype=np.float64)
+
+    def lookup(self, ids):
+        """
+        Map an array of destination IDs to column positions. Raises QuoteError for unknown IDs.
+        """
+        positions = np.searchsorted(self.ids, ids)
+        positions[positions == len(self.ids)] = 0
+        unknown = self.ids[positions] != ids if len(self.ids) else np.ones(len(ids), dtype=bool)
+        if unknown.any():
+            raise QuoteError(f"Unknown destination IDs: {', '.join(np.unique(ids[unknown])[:10])}")
+        return positions
+
+
+def _season_table():
+    """
+    Cumulative seasonal multiplier by day since CALENDAR_START, so the
+    multiplier-weighted nights of any stay are table[end] - table[start].
+    """
+    days = np.arange(CALENDAR_START, CALENDAR_END)
+    months = days.astype("datetime64[M]").astype(np.int64) % 12
+    multipliers = np.array(Config.SEASONAL_MULTIPLIERS, dtype=np.float64)[months]
+    return np.concatenate(([0.0], np.cumsum(multipliers)))
+
+
+season_table = _season_table()
+
+_columns = None
+_columns_lock = threading.Lock()
+
+
+def price_columns(snapshot):
+    """
+    Price columns for the given snapshot, rebuilt only when the snapshot changes.
+    Keyed on the snapshot itself: separate stores can be at the same version.
+    """
+    global _columns
+    columns = _columns
+    if columns is not None and columns.snapshot is snapshot:
+        return columns
+    with _columns_lock:
+        if _columns is None or _columns.snapshot is not snapshot:
+            _columns = PriceColumns(snapshot)
+        return _columns
+
+
+def quote(snapshot, ids, nights=None, check_in=None, check_out=None):
+    """
+    Price many stays at once.
+    Each stay is a destination ID with either a night count or check-out date. With a
+    check-in date every night is priced with its month's seasonal multiplier; without
+    one nights are priced flat. Length-of-stay discounts apply per stay.
+    Returns (totals, discount rates) as float64 arrays.
+    """
+    try:
+        if not all(isinstance(key, str) for key in ids):
+            raise QuoteError("ids must be a non-empty list of destination IDs")
+        ids = np.asarray(ids, dtype=str)
+    except (TypeError, ValueError):
+        raise QuoteError("ids must be a non-empty list of destination IDs")
+    if ids.ndim != 1 or len(ids) == 0:
+        raise QuoteError("ids must be a non-empty list of destination IDs")
+    if len(ids) > Config.QUOTE_MAX_LINES:
+        raise QuoteError(f"At most {Config.QUOTE_MAX_LINES} stays can be quoted at once")
+
+    if nights is not None and check_out is not None:
+        raise QuoteError("Give either nights or check_out, not both")
+
+    try:
+        start = None
+        if check_in is not None:
+            start = (np.asarray(check_in, dtype="datetime64[D]") - CALENDAR_START).astype(np.int64)
+        if check_out is not None:
+            if start is None:
+                raise QuoteError("check_out requires check_in")
+            nights = (np.asarray(check_out, dtype="datetime64[D]") - CALENDAR_START).astype(np.int64) - start
+        elif nights is not None:
+            nights = np.asarray(nights)
+            if nights.dtype.kind not in "iu":
+                raise QuoteError("nights must be whole numbers")
+            nights = nights.astype(np.int64)
+        else:
+            raise QuoteError("Either nights or check_out is required")
+    except (TypeError, ValueError) as e:
+        raise QuoteError(f"Invalid stay data: {e}")
+
+    if nights.shape != ids.shape or (start is not None and start.shape != ids.shape):
+        raise QuoteError("ids, nights and dates must have the same length")
+    if (nights < 1).any():
+        raise QuoteError("Every stay needs at least one night")
+
+    columns = price_columns(snapshot)
+    prices = columns.prices[columns.lookup(ids)]
+    unpriced = np.isnan(prices)
+    if unpriced.any():
+        raise QuoteError(f"Destinations without a valid price: {', '.join(np.unique(ids[unpriced])[:10])}")
+
+    if start is None:
+        weighted_nights = nights.astype(np.float64)
+    else:
+        end = start + nights
+        if (start < 0).any() or (end >= len(season_table)).any():
+            raise QuoteError(f"Stays must fall between {CALENDAR_START} and {CALENDAR_END}")
+        weighted_nights = season_table[end] - season_table[start]
+
+    rates = np.zeros(len(ids), dtype=np.float64)
+    for min_nights, rate in sorted(Config.LENGTH_OF_STAY_DISCOUNTS):
+        rates[nights >= min_nights] = rate
+
+    totals = np.round(prices * weighted_nights * (1.0 - rates), 2)
+    return totals, rates
@@ -0,0 +1,119 @@
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
+from shared.config import Config
+
+FIELDS = ("id", "name", "description", "location", "price_per_night")
+
+
+class ProjectionError(Exception):
+    pass
+
+
+class Projection:
+    """
+    A precompiled projection of destination records onto a fixed tuple of fields.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        getter = itemgetter(*self.fields)
+        # itemgetter returns a bare value rather than a tuple for a single field
+        self._values = (lambda record: (getter(record),)) if len(self.fields) == 1 else getter
+
+    def project(self, records):
+        """
+        Project an iterable of destination records into a list of dicts.
+        """
+        if self.fields == FIELDS:
+            # Stored records hold exactly the catalog fields
+            return list(records)
+        fields, values = self.fields, self._values
+        return [dict(zip(fields, values(record))) for record in records]
+
+
+ADMIN = Projection(FIELDS)
+PUBLIC = Projection(FIELDS[1:])
+
+
+@lru_cache(maxsize=64)
+def compile_projection(fields):
+    if fields == ADMIN.fields:
+        return ADMIN
+    if fields == PUBLIC.fields:
+        return PUBLIC
+    return Projection(fields)
+
+
+def with_ids(projection):
+    """
+    The same projection keyed by destination ID, as deltas need.
+    """
+    return compile_projection(tuple(field for field in FIELDS if field == "id" or field in projection.fields))
+
+
+def projection_for(fields_param, include_ids):
+    """
+    Resolve a `fields` query parameter to a projection. Fields are returned in catalog
+    order whatever order they were asked for, so equivalent requests share a cache entry.
+    Callers without access to IDs silently don't get them.
+    """
+    if fields_param is None:
+        return ADMIN if include_ids else PUBLIC
+    requested = {field.strip() for field in fields_param.split(",") if field.strip()}
+    unknown = requested.difference(FIELDS)
+    if unknown:
+        raise ProjectionError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not include_ids:
+        requested.discard("id")
+    if not requested:
+        raise ProjectionError(f"fields must name at least one of: {', '.join(FIELDS[1:])}")
+    return compile_projection(tuple(field for field in FIELDS if field in requested))
+
+
+class RenderCache:
+    """
+    Serialized projections of the catalog, kept for the current snapshot only.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or Config.PROJECTION_CACHE_SIZE
+        self._snapshot = None
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, snapshot, projection):
+        """
+        The JSON array of `snapshot` projected by `projection`, serialized once per snapshot.
+        """
+        key = projection.fields
+        with self._lock:
+            if self._snapshot is snapshot and key in self._payloads:
+                self._payloads.move_to_end(key)
+                return self._payloads[key]
+
+        payload = json.dumps(projection.project(snapshot.records.values()), separators=(",", ":")).encode()
+
+        with self._lock:
+            if self._snapshot is not snapshot:
+                if self._snapshot is not None and snapshot.version < self._snapshot.version:
+                    # A reader holding an older snapshot mustn't evict the current one
+                    return payload
+                self._snapshot = snapshot
+                self._payloads.clear()
+            self._payloads[key] = payload
+            while len(self._payloads) > self.size:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._snapshot.version if self._snapshot is not None else None,
+                "projections": [list(key) for key in self._payloads],
+            }
+
+
+renders = RenderCache()
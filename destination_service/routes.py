@@ -1,17 +1,34 @@
 from flask import request, jsonify
+from functools import wraps
+import logging
 import requests
-from . import app
-from .models import destinations
+from shared import upstream
+from shared.config import Config
+from shared.singleflight import token_validations
+from . import app, readiness
+from . import models
+from .models import catalog_for_update, current_snapshot, written_version
+from .events import broadcaster
+from .pricing import quote, price_columns, QuoteError
+from .batch import BatchError, apply_batch, check_fields
+from .projection import ADMIN, PUBLIC, ProjectionError, projection_for, renders, with_ids
+from . import similarity
+from .availability import AvailabilityError, Unavailable, availability
+from .shared_catalog import CatalogReadTimeout
+from .shards import ShardUnavailable
+from .search import SearchError, SearchQuery, index_for, search
 
-AUTH_SERVICE_URL = "http://localhost:5001"
-USER_SERVICE_URL = "http://localhost:5000"
+logger = logging.getLogger(__name__)
+
+AUTH_SERVICE_URL = Config.AUTH_SERVICE_URL
+USER_SERVICE_URL = Config.USER_SERVICE_URL
 
 def fetch_token_from_user_service():
     """
     Fetch the token from the User Service's hidden internal endpoint.
     """
     try:
-        response = requests.get(f"{USER_SERVICE_URL}/_internal/get_token", headers={"X-Internal-Request": "true"})
+        response = upstream.call("user", "get", f"{USER_SERVICE_URL}/_internal/get_token", headers={"X-Internal-Request": "true"})
         if response.status_code == 200:
             token = response.json().get("access_token")
             if token:
@@ -21,25 +38,122 @@ def fetch_token_from_user_service():
         else:
             response_text = response.text if isinstance(response.text, str) else str(response.text)
             raise Exception(f"Failed to fetch token from User Service: {response_text}")
+    except upstream.UpstreamUnavailable:
+        raise
     except Exception as e:
         raise Exception(f"Token fetch failed: {str(e)}")
 
 
+def caller_token():
+    """
+    The bearer token the request carries, e.g. forwarded by the gateway. Requests without
+    one fall back to the User Service's active token.
+    """
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer ") and header[len("Bearer "):].strip():
+        return header[len("Bearer "):].strip()
+    return fetch_token_from_user_service().replace("Bearer ", "")
+
+
 def validate_token(required_role=None):
     try:
-        token = fetch_token_from_user_service().replace("Bearer ", "")
-        response = requests.get(f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {token}"})
+        token = caller_token()
+        response = token_validations.do(token, upstream.call, "auth", "get", f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {token}"})
         if response.status_code != 200:
             raise Exception("Invalid or expired token")
         user_info = response.json()
         if required_role and user_info.get("role") != required_role:
             raise Exception(f"Unauthorized action: {required_role}s only")
         return user_info
+    except upstream.UpstreamUnavailable:
+        raise
     except Exception as e:
-        print(f"Token validation error: {e}")
+        logger.warning("Token validation error: %s", e, extra={"sample": True})
         raise
 
 
+def upstream_unavailable():
+    """
+    503 for requests whose token can't be checked because the user or auth service is down.
+    """
+    response = jsonify({"message": "Authentication service unavailable"})
+    response.headers["Retry-After"] = str(int(Config.BREAKER_RESET_TIMEOUT))
+    return response, 503
+
+
+def local_catalog_only(view):
+    """
+    For views that need the whole catalog in this process, which isn't the case when it is sharded.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if models.sharded_catalog is not None:
+            return jsonify({"message": "Not available when the catalog is sharded"}), 501
+        return view(*args, **kwargs)
+    wrapper.local_catalog_only = True
+    return wrapper
+
+
+def persistent_process_only(view):
+    """
+    For views whose state lives in this process. With DESTINATION_PROCESSES every request
+    runs in a process forked for it that exits afterwards, taking that state with it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if models.shared_catalog is not None:
+            return jsonify({"message": "Not available when each request runs in its own process"}), 501
+        return view(*args, **kwargs)
+    wrapper.persistent_process_only = True
+    return wrapper
+
+
+def marked_endpoints(marker):
+    """
+    "METHOD /path" of every endpoint whose view carries `marker`, for startup warnings.
+    """
+    return sorted(
+        f"{' '.join(sorted(rule.methods - {'HEAD', 'OPTIONS'}))} {rule.rule}"
+        for rule in app.url_map.iter_rules()
+        if getattr(app.view_functions[rule.endpoint], marker, False)
+    )
+
+
+def local_catalog_only_endpoints():
+    """
+    Endpoints that answer 501 while the catalog is sharded.
+    """
+    return marked_endpoints("local_catalog_only") + ["GET /destinations?since="]
+
+
+def persistent_process_only_endpoints():
+    """
+    Endpoints that answer 501 while each request runs in its own process.
+    """
+    return marked_endpoints("persistent_process_only")
+
+
+def find_destination(destination_id):
+    """
+    One destination by ID, from the shard that owns it when the catalog is sharded.
+    """
+    if models.sharded_catalog is not None:
+        return models.sharded_catalog.get(destination_id)
+    return current_snapshot().records.get(destination_id)
+
+
+@app.errorhandler(CatalogReadTimeout)
+def catalog_read_timeout(e):
+    logger.error("Shared catalog read failed: %s", e)
+    return jsonify({"message": "Catalog temporarily unavailable"}), 503
+
+
+@app.errorhandler(ShardUnavailable)
+def shard_unavailable(e):
+    logger.error("Sharded catalog call failed: %s", e)
+    return jsonify({"message": "Part of the catalog is unavailable"}), 503
+
+
 @app.route("/")
 def home():
     """
@@ -64,6 +178,16 @@ def get_destinations():
         required: false
         type: string
         description: Bearer token for authentication
+      - in: query
+        name: since
+        required: false
+        type: integer
+        description: Catalog version the client already has. Returns only the changes after it, or a full snapshot if it is too old.
+      - in: query
+        name: fields
+        required: false
+        type: string
+        description: Comma-separated fields to return, e.g. `name,price_per_night`. Only admins can request `id`.
     responses:
       200:
         description: List of destinations
@@ -87,23 +211,357 @@ def get_destinations():
               price_per_night:
                 type: number
                 example: 150
+      400:
+        description: Invalid since version or unknown field
+      501:
+        description: since was given but the catalog is sharded
+      503:
+        description: User or authentication service unavailable
     """
     # Validate token if present
     try:
         user_info = validate_token()
         role = user_info.get("role")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        logger.warning("Error in GET /destinations: %s", e, extra={"sample": True})
+        return jsonify({"message": str(e)}), 401
+
+    fields = request.args.get("fields")
+    try:
+        projection = projection_for(fields, include_ids=role == "Admin")
+    except ProjectionError as e:
+        return jsonify({"message": str(e)}), 400
+
+    since = request.args.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            return jsonify({"message": "since must be a non-negative integer version"}), 400
+        if models.sharded_catalog is not None:
+            return jsonify({"message": "since is not available when the catalog is sharded"}), 501
+        return get_destinations_since(since, role, projection)
+
+    if models.sharded_catalog is not None:
+        # Every shard sends its partition sorted by ID; they are merged into one listing
+        version, records = models.sharded_catalog.records()
+        response = jsonify(projection.project(records))
+        response.headers["X-Catalog-Version"] = str(version)
+        return response, 200
+
+    if models.shared_catalog is not None and fields is None:
+        # Serve the pre-serialized snapshot straight from shared memory
+        version, payload = models.shared_catalog.read(include_ids=role == "Admin")
+        return app.response_class(payload, mimetype="application/json", headers={"X-Catalog-Version": str(version)}), 200
+
+    # Readers work on an immutable snapshot, so concurrent writes can't disturb the iteration
+    snapshot = current_snapshot()
+    payload = renders.render(snapshot, projection)
+    return app.response_class(payload, mimetype="application/json", headers={"X-Catalog-Version": str(snapshot.version)}), 200
+
+
+def get_destinations_since(since, role, projection):
+    """
+    Changes to the catalog after version `since`.
+    Admins get upserted records and tombstones for deleted IDs. Regular users can't
+    key a delta without IDs, so they get an empty delta when nothing changed and a
+    full snapshot otherwise. Versions older than the change log also get a full snapshot.
+    Records are projected onto the requested fields; admin upserts always keep their ID.
+    """
+    if models.shared_catalog is not None and projection in (ADMIN, PUBLIC):
+        version, payload = models.shared_catalog.read(include_ids=role == "Admin")
+        if since == version:
+            return jsonify({"version": version, "full": False, "upserted": [], "deleted": []}), 200
+        body = b'{"version": %d, "full": true, "destinations": %s}' % (version, payload)
+        return app.response_class(body, mimetype="application/json"), 200
+
+    snapshot = current_snapshot()
+    delta = snapshot.delta(since)
+    if delta is not None and (role == "Admin" or delta == ([], [])):
+        upserted, deleted = delta
+        upserted = with_ids(projection).project(upserted)
+        return jsonify({"version": snapshot.version, "full": False, "upserted": upserted, "deleted": deleted}), 200
+
+    body = b'{"version":%d,"full":true,"destinations":%s}' % (snapshot.version, renders.render(snapshot, projection))
+    return app.response_class(body, mimetype="application/json"), 200
+
+
+@app.route("/destinations/search", methods=["GET"])
+def search_destinations():
+    """
+    Filter, sort and page through the catalog.
+    ---
+    tags:
+      - Destinations
+    summary: Search destinations
+    description: >
+      Destinations matching every given filter, in a stable order. When the catalog is
+      sharded each shard searches its own destinations in parallel and the results are
+      merged, so pages are the same as from a single catalog. Admins see the `id` field.
+    parameters:
+      - in: header
+        name: Authorization
+        required: false
+        type: string
+        description: Bearer token for authentication
+      - in: query
+        name: q
+        required: false
+        type: string
+        description: Text to find in the name, description or location (case-insensitive)
+      - in: query
+        name: location
+        required: false
+        type: string
+        description: Exact location (case-insensitive)
+      - in: query
+        name: min_price
+        required: false
+        type: number
+      - in: query
+        name: max_price
+        required: false
+        type: number
+      - in: query
+        name: sort
+        required: false
+        type: string
+        default: "id"
+        description: id, name, location or price_per_night; prefix with `-` for descending. Ties are ordered by ID.
+      - in: query
+        name: offset
+        required: false
+        type: integer
+        description: Matches to skip (default 0, at most 10000)
+      - in: query
+        name: limit
+        required: false
+        type: integer
+        description: Most destinations to return (default 50, at most 500)
+    responses:
+      200:
+        description: The page of matching destinations and the total number of matches
+      400:
+        description: Invalid filter, sort, offset or limit
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        user_info = validate_token()
+        role = user_info.get("role")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
     except Exception as e:
-        print(f"Error in GET /destinations: {e}")
         return jsonify({"message": str(e)}), 401
 
-    if role == "Admin":
-        return jsonify(list(destinations.values())), 200
+    try:
+        query = SearchQuery.from_args(request.args)
+    except SearchError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if models.sharded_catalog is not None:
+        total, records = models.sharded_catalog.search(query)
     else:
-        filtered_destinations = [
-            {key: value for key, value in dest.items() if key != "id"}
-            for dest in destinations.values()
-        ]
-        return jsonify(filtered_destinations), 200
+        total, records = search(current_snapshot(), query)
+    projection = ADMIN if role == "Admin" else PUBLIC
+    return jsonify({"count": total, "offset": query.offset, "destinations": projection.project(records)}), 200
+
+
+@app.route("/destinations/<destination_id>", methods=["GET"])
+def get_destination(destination_id):
+    """
+    Retrieve one destination.
+    ---
+    tags:
+      - Destinations
+    summary: Retrieve a destination by ID
+    description: Admins see the `id` field, while regular users do not.
+    parameters:
+      - in: header
+        name: Authorization
+        required: false
+        type: string
+        description: Bearer token for authentication
+      - in: path
+        name: destination_id
+        required: true
+        type: string
+        default: "PAR"
+    responses:
+      200:
+        description: The destination
+      401:
+        description: Missing or invalid token
+      404:
+        description: Destination not found
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        user_info = validate_token()
+        role = user_info.get("role")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 401
+
+    destination = find_destination(destination_id)
+    if destination is None:
+        return jsonify({"message": "Destination not found"}), 404
+    return jsonify(destination if role == "Admin" else PUBLIC.project([destination])[0]), 200
+
+
+@app.route("/destinations/stream", methods=["GET"])
+@local_catalog_only
+@persistent_process_only
+def stream_destinations():
+    """
+    Stream destination changes as server-sent events.
+    ---
+    tags:
+      - Destinations
+    summary: Subscribe to destination changes
+    description: >
+      Pushes an `add`, `update` or `delete` event for every catalog change. The event ID is the
+      catalog version. Subscribers that fall behind are disconnected and can catch up with
+      `GET /destinations?since=<last event ID>`. Regular users don't receive destination IDs.
+    parameters:
+      - in: header
+        name: Authorization
+        required: false
+        type: string
+        description: Bearer token for authentication
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: Event stream
+      401:
+        description: Missing or invalid token
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        user_info = validate_token()
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 401
+
+    subscriber = broadcaster.subscribe(include_ids=user_info.get("role") == "Admin")
+    return app.response_class(
+        broadcaster.stream(subscriber),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/destinations/quote", methods=["POST"])
+@local_catalog_only
+def quote_destinations():
+    """
+    Quote many stays in one request.
+    ---
+    tags:
+      - Destinations
+    summary: Batch trip quote
+    description: >
+      Prices stays given as parallel arrays. Each stay is a destination ID with either a
+      night count or a check-out date. With a check-in date each night is priced with its
+      month's seasonal multiplier. Length-of-stay discounts apply per stay.
+    parameters:
+      - in: header
+        name: Authorization
+        required: false
+        type: string
+        description: Bearer token for authentication
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            ids:
+              type: array
+              items:
+                type: string
+              example: ["PAR", "TOK"]
+            nights:
+              type: array
+              items:
+                type: integer
+              example: [3, 7]
+            check_in:
+              type: array
+              items:
+                type: string
+                format: date
+              example: ["2025-07-01", "2025-12-20"]
+            check_out:
+              type: array
+              items:
+                type: string
+                format: date
+          required:
+            - ids
+    responses:
+      200:
+        description: Quoted totals, in the same order as the request
+        schema:
+          type: object
+          properties:
+            version:
+              type: integer
+            count:
+              type: integer
+            totals:
+              type: array
+              items:
+                type: number
+            discount_rates:
+              type: array
+              items:
+                type: number
+            grand_total:
+              type: number
+      400:
+        description: Invalid stays or unknown destination IDs
+      401:
+        description: Missing or invalid token
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        validate_token()
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 401
+
+    data = request.get_json(silent=True) or {}
+    if "ids" not in data:
+        return jsonify({"message": "Missing required fields"}), 400
+
+    snapshot = current_snapshot()
+    try:
+        totals, rates = quote(
+            snapshot, data["ids"], nights=data.get("nights"),
+            check_in=data.get("check_in"), check_out=data.get("check_out"),
+        )
+    except QuoteError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify({
+        "version": snapshot.version,
+        "count": len(totals),
+        "totals": totals.tolist(),
+        "discount_rates": rates.tolist(),
+        "grand_total": round(float(totals.sum()), 2),
+    }), 200
 
 
 @app.route("/destinations", methods=["POST"])
@@ -152,30 +610,45 @@ def add_destination():
         description: Missing or invalid token
       403:
         description: Unauthorized action
+      503:
+        description: User or authentication service unavailable
     """
     try:
         # Validate token and ensure the user is an admin
         user_info = validate_token(required_role="Admin")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
     except Exception as e:
         return jsonify({"message": str(e)}), 403
 
     data = request.get_json()
     required_fields = ["id", "name", "description", "location", "price_per_night"]
 
-    if not all(field in data for field in required_fields):
+    if not isinstance(data, dict) or not all(field in data for field in required_fields):
         return jsonify({"message": "Missing required fields"}), 400
 
     destination_id = data["id"]
-    if destination_id in destinations:
-        return jsonify({"message": "Destination ID already exists"}), 400
-
-    destinations[destination_id] = {
+    destination = {
         "id": destination_id,
         "name": data["name"],
         "description": data["description"],
         "location": data["location"],
         "price_per_night": data["price_per_night"]
     }
+    try:
+        check_fields(destination)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if models.sharded_catalog is not None:
+        if not models.sharded_catalog.add(destination):
+            return jsonify({"message": "Destination ID already exists"}), 400
+        return jsonify({"message": "Destination added successfully"}), 201
+
+    with catalog_for_update() as catalog:
+        if destination_id in catalog:
+            return jsonify({"message": "Destination ID already exists"}), 400
+
+        catalog[destination_id] = destination
     return jsonify({"message": "Destination added successfully"}), 201
 
 
@@ -210,15 +683,380 @@ def delete_destination(destination_id):
         description: Unauthorized action
       404:
         description: Destination not found
+      503:
+        description: User or authentication service unavailable
     """
     try:
         # Validate token and ensure the user is an admin
         validate_token(required_role="Admin")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
     except Exception as e:
         return jsonify({"message": str(e)}), 403
 
-    if destination_id not in destinations:
-        return jsonify({"message": "Destination not found"}), 404
+    if models.sharded_catalog is not None:
+        if not models.sharded_catalog.delete(destination_id):
+            return jsonify({"message": "Destination not found"}), 404
+        return jsonify({"message": "Destination deleted successfully"}), 200
 
-    del destinations[destination_id]
+    with catalog_for_update() as catalog:
+        if destination_id not in catalog:
+            return jsonify({"message": "Destination not found"}), 404
+
+        del catalog[destination_id]
     return jsonify({"message": "Destination deleted successfully"}), 200
+
+
+@app.route("/destinations/<destination_id>/similar", methods=["GET"])
+@local_catalog_only
+def similar_destinations(destination_id):
+    """
+    Destinations most similar to a given one.
+    ---
+    tags:
+      - Destinations
+    summary: Recommend similar destinations
+    description: >
+      Ranks destinations by TF-IDF similarity of their name, description and location,
+      blended with how close their price per night is. Admins see the `id` field.
+    parameters:
+      - in: header
+        name: Authorization
+        required: false
+        type: string
+        description: Bearer token for authentication
+      - in: path
+        name: destination_id
+        required: true
+        type: string
+        default: "PAR"
+      - in: query
+        name: k
+        required: false
+        type: integer
+        description: Number of recommendations (default 5, at most 20)
+    responses:
+      200:
+        description: Similar destinations, most similar first, each with a `score`
+      400:
+        description: Invalid k
+      404:
+        description: Destination not found
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        user_info = validate_token()
+        role = user_info.get("role")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 401
+
+    try:
+        k = int(request.args.get("k", 5))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= similarity.index.max_k:
+        return jsonify({"message": f"k must be between 1 and {similarity.index.max_k}"}), 400
+
+    snapshot = current_snapshot()
+    similarity.index.sync(snapshot)
+    try:
+        neighbors = similarity.index.similar(destination_id, k)
+    except KeyError:
+        return jsonify({"message": "Destination not found"}), 404
+
+    include_ids = role == "Admin"
+    results = []
+    for neighbor_id, score in neighbors:
+        record = snapshot.records.get(neighbor_id)
+        if record is not None:
+            results.append({**(record if include_ids else PUBLIC.project([record])[0]), "score": score})
+    return jsonify({"similar": results}), 200
+
+
+@app.route("/destinations/<destination_id>/bookings", methods=["POST"])
+@persistent_process_only
+def book_destination(destination_id):
+    """
+    Book a destination for a date range.
+    ---
+    tags:
+      - Destinations
+    summary: Book a stay
+    description: Reserves every night from check-in up to check-out, or none of them if any night is taken.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        default: "Bearer "
+        description: Bearer token for authentication
+      - in: path
+        name: destination_id
+        required: true
+        type: string
+        default: "PAR"
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            check_in:
+              type: string
+              format: date
+              example: "2026-07-01"
+            check_out:
+              type: string
+              format: date
+              example: "2026-07-06"
+    responses:
+      201:
+        description: Stay booked
+      400:
+        description: Invalid dates
+      401:
+        description: Missing or invalid token
+      404:
+        description: Destination not found
+      409:
+        description: Some nights are already booked
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        validate_token()
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 401
+
+    if find_destination(destination_id) is None:
+        return jsonify({"message": "Destination not found"}), 404
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"message": "Body must be a JSON object with check_in and check_out"}), 400
+    try:
+        nights = availability.book(destination_id, data.get("check_in"), data.get("check_out"))
+    except Unavailable as e:
+        return jsonify({"message": str(e)}), 409
+    except AvailabilityError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify({
+        "message": "Booking confirmed",
+        "check_in": data["check_in"],
+        "check_out": data["check_out"],
+        "nights": nights,
+    }), 201
+
+
+@app.route("/destinations/available", methods=["GET"])
+@local_catalog_only
+@persistent_process_only
+def available_destinations():
+    """
+    Destinations free for a whole stay.
+    ---
+    tags:
+      - Destinations
+    summary: Search availability
+    description: Destinations with every night from check-in to check-out free, cheapest first. Admins see the `id` field.
+    parameters:
+      - in: header
+        name: Authorization
+        required: false
+        type: string
+        description: Bearer token for authentication
+      - in: query
+        name: check_in
+        required: true
+        type: string
+        format: date
+      - in: query
+        name: check_out
+        required: true
+        type: string
+        format: date
+      - in: query
+        name: max_price
+        required: false
+        type: number
+        description: Highest acceptable price per night
+      - in: query
+        name: limit
+        required: false
+        type: integer
+        description: Most destinations to return (default and maximum 100)
+    responses:
+      200:
+        description: Matching destinations and the total number of matches
+      400:
+        description: Invalid dates, price cap or limit
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        user_info = validate_token()
+        role = user_info.get("role")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 401
+
+    try:
+        max_price = request.args.get("max_price")
+        max_price = float(max_price) if max_price is not None else None
+        limit = int(request.args.get("limit", Config.AVAILABILITY_SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({"message": "max_price must be a number and limit an integer"}), 400
+    if not 1 <= limit <= Config.AVAILABILITY_SEARCH_LIMIT:
+        return jsonify({"message": f"limit must be between 1 and {Config.AVAILABILITY_SEARCH_LIMIT}"}), 400
+
+    snapshot = current_snapshot()
+    columns = price_columns(snapshot)
+    try:
+        matches = availability.search(columns, request.args.get("check_in"), request.args.get("check_out"), max_price)
+    except AvailabilityError as e:
+        return jsonify({"message": str(e)}), 400
+
+    records = [snapshot.records[key] for key in columns.ids[matches[:limit]].tolist()]
+    projection = ADMIN if role == "Admin" else PUBLIC
+    return jsonify({"count": len(matches), "destinations": projection.project(records)}), 200
+
+
+@app.route("/destinations/batch", methods=["POST"])
+@local_catalog_only
+def batch_destinations():
+    """
+    Apply many destination changes atomically (Admin only).
+    ---
+    tags:
+      - Destinations
+    summary: Create, update and delete destinations in one call
+    description: >
+      Operations are applied in order under a single token validation. If any operation
+      is invalid none of them are applied; otherwise the whole batch is published as a
+      single catalog version.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        default: "Bearer "
+        description: Bearer token for authentication
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            operations:
+              type: array
+              items:
+                type: object
+                properties:
+                  op:
+                    type: string
+                    enum: [create, update, delete]
+                  id:
+                    type: string
+                    description: Destination to update or delete
+                  destination:
+                    type: object
+                    description: Full destination to create
+                  changes:
+                    type: object
+                    description: Fields to change on update
+              example:
+                - {"op": "create", "destination": {"id": "SWZ", "name": "Mountain Retreat", "description": "A serene mountain retreat.", "location": "Switzerland", "price_per_night": 200}}
+                - {"op": "update", "id": "PAR", "changes": {"price_per_night": 210}}
+                - {"op": "delete", "id": "TOK"}
+    responses:
+      200:
+        description: Batch applied
+        schema:
+          type: object
+          properties:
+            version:
+              type: integer
+              example: 12
+            applied:
+              type: object
+              example: {"create": 1, "update": 1, "delete": 1}
+      400:
+        description: Invalid operation; nothing was applied
+      403:
+        description: Unauthorized action
+      503:
+        description: User or authentication service unavailable
+    """
+    try:
+        validate_token(required_role="Admin")
+    except upstream.UpstreamUnavailable:
+        return upstream_unavailable()
+    except Exception as e:
+        return jsonify({"message": str(e)}), 403
+
+    data = request.get_json(silent=True)
+    operations = data.get("operations") if isinstance(data, dict) else None
+    try:
+        with catalog_for_update() as catalog:
+            applied = apply_batch(catalog, operations)
+    except BatchError as e:
+        return jsonify({"message": str(e), "index": e.index}), 400
+
+    return jsonify({
+        "message": "Batch applied successfully",
+        "version": written_version(),
+        "applied": applied,
+    }), 200
+
+
+@readiness.add_warmer
+def check_upstreams():
+    # Both validation hops must answer before traffic arrives
+    for name, url in (("user", USER_SERVICE_URL), ("auth", AUTH_SERVICE_URL)):
+        upstream.call(name, "get", f"{url}/healthz").raise_for_status()
+
+
+@readiness.add_warmer
+def warm_catalog_caches():
+    if models.sharded_catalog is not None:
+        # Make sure every shard worker answers before traffic arrives
+        models.sharded_catalog.size()
+        return
+    snapshot = current_snapshot()
+    price_columns(snapshot)
+    for projection in (ADMIN, PUBLIC):
+        renders.render(snapshot, projection)
+    similarity.index.sync(snapshot)
+    index_for(snapshot)
+
+
+@app.route("/_internal/upstreams", methods=["GET"])
+@persistent_process_only
+def _internal_upstreams():
+    """
+    Hidden internal endpoint exposing circuit breaker state for operators.
+    """
+    if request.headers.get("X-Internal-Request") != "true":
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return jsonify(upstream.stats()), 200
+
+
+
+@app.route("/_internal/stream_stats", methods=["GET"])
+@persistent_process_only
+def _internal_stream_stats():
+    """
+    Hidden internal endpoint exposing subscriber count and backlog of the change stream.
+    """
+    if request.headers.get("X-Internal-Request") != "true":
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return jsonify(broadcaster.stats()), 200
\ No newline at end of file
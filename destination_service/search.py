@@ -0,0 +1,138 @@
+import heapq
+from itertools import islice
+from numbers import Number
+from shared.config import Config
+
+SORT_FIELDS = ("id", "name", "location", "price_per_night")
+TEXT_FIELDS = ("name", "description", "location")
+
+
+class SearchError(Exception):
+    pass
+
+
+def _number(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise SearchError(f"{name} must be a number")
+
+
+def _price(record):
+    price = record.get("price_per_night")
+    return price if isinstance(price, Number) and not isinstance(price, bool) else None
+
+
+class SearchQuery:
+    """
+    Filters, ordering and page of a catalog search. Results are ordered by `sort`
+    (descending with a leading "-") and then by ID, so every destination has one
+    position and pages can be merged from any number of partitions.
+    """
+    __slots__ = ("text", "location", "min_price", "max_price", "sort", "descending", "offset", "limit")
+
+    def __init__(self, text=None, location=None, min_price=None, max_price=None, sort="id", offset=0, limit=50):
+        self.text = text.casefold() if text else None
+        self.location = location.casefold() if location else None
+        self.min_price = min_price
+        self.max_price = max_price
+        self.descending = sort.startswith("-")
+        self.sort = sort.lstrip("-")
+        if self.sort not in SORT_FIELDS:
+            raise SearchError(f"sort must be one of {', '.join(SORT_FIELDS)}, optionally prefixed with '-'")
+        self.offset = offset
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args):
+        try:
+            offset = int(args.get("offset", 0))
+            limit = int(args.get("limit", 50))
+        except ValueError:
+            raise SearchError("offset and limit must be integers")
+        if not 1 <= limit <= Config.DESTINATION_SEARCH_LIMIT:
+            raise SearchError(f"limit must be between 1 and {Config.DESTINATION_SEARCH_LIMIT}")
+        if not 0 <= offset <= Config.DESTINATION_SEARCH_MAX_OFFSET:
+            raise SearchError(f"offset must be between 0 and {Config.DESTINATION_SEARCH_MAX_OFFSET}")
+        return cls(
+            text=args.get("q"), location=args.get("location"),
+            min_price=_number(args, "min_price"), max_price=_number(args, "max_price"),
+            sort=args.get("sort", "id"), offset=offset, limit=limit,
+        )
+
+    def key(self, record):
+        if self.sort == "price_per_night":
+            value = _price(record)
+        else:
+            value = record.get(self.sort)
+            value = value.casefold() if isinstance(value, str) else None
+        # A missing or mistyped field sorts apart from the rest instead of breaking the comparison
+        return (1, 0) if value is None else (0, value), record["id"]
+
+    def matches(self, text, record):
+        if self.text is not None and self.text not in text:
+            return False
+        if self.location is not None:
+            location = record.get("location")
+            if not isinstance(location, str) or location.casefold() != self.location:
+                return False
+        if self.min_price is None and self.max_price is None:
+            return True
+        price = _price(record)
+        if price is None or (self.min_price is not None and price < self.min_price):
+            return False
+        return self.max_price is None or price <= self.max_price
+
+    def page(self, index):
+        """
+        Search one partition. Returns (matches, the first offset + limit of them in order):
+        enough for any merge to cut the requested page from.
+        """
+        matches = [record for text, record in index.entries if self.matches(text, record)]
+        select = heapq.nlargest if self.descending else heapq.nsmallest
+        return len(matches), select(self.offset + self.limit, matches, key=self.key)
+
+    def merge(self, pages):
+        """
+        Combine the pages of every partition into (total matches, requested page).
+        """
+        total = sum(count for count, _ in pages)
+        merged = heapq.merge(*(records for _, records in pages), key=self.key, reverse=self.descending)
+        return total, list(islice(merged, self.offset, self.offset + self.limit))
+
+
+class SearchIndex:
+    """
+    The records of one catalog snapshot, each paired with its lower-cased searchable text.
+    Text fields that aren't strings are left out of it.
+    """
+
+    def __init__(self, records):
+        self.entries = [
+            ("\n".join(value for value in map(record.get, TEXT_FIELDS) if isinstance(value, str)).casefold(), record)
+            for record in records
+        ]
+
+
+_latest = None
+
+
+def index_for(snapshot):
+    """
+    Search index of a snapshot, built once and reused until the catalog changes.
+    """
+    global _latest
+    latest = _latest
+    if latest is None or latest[0] is not snapshot:
+        latest = _latest = (snapshot, SearchIndex(snapshot.records.values()))
+    return latest[1]
+
+
+def search(snapshot, query):
+    """
+    Run a query against a whole snapshot. Returns (total matches, requested page).
+    """
+    return query.merge([query.page(index_for(snapshot))])
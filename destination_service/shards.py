@@ -0,0 +1,214 @@
+import logging
+import multiprocessing
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from heapq import merge
+from operator import itemgetter
+from .catalog_file import sync_records
+from .models import DestinationStore
+from .search import index_for
+
+logger = logging.getLogger(__name__)
+
+
+class ShardUnavailable(Exception):
+    pass
+
+
+def shard_for(destination_id, shards):
+    """
+    Shard that owns a destination ID. crc32 is stable across processes and restarts, unlike hash().
+    IDs that aren't strings, which POST /destinations accepts, are hashed by their str().
+    """
+    return zlib.crc32(str(destination_id).encode()) % shards
+
+
+class ShardPartition:
+    """
+    The destinations one shard worker owns, in a copy-on-write store of its own.
+    """
+
+    def __init__(self, records):
+        self.store = DestinationStore(records)
+        self._ordered = None
+
+    def version(self):
+        return self.store.snapshot().version
+
+    def get(self, destination_id):
+        return self.store.snapshot().records.get(destination_id)
+
+    def add(self, record):
+        with self.store.update() as records:
+            if record["id"] in records:
+                return False
+            records[record["id"]] = record
+        return True
+
+    def delete(self, destination_id):
+        with self.store.update() as records:
+            if destination_id not in records:
+                return False
+            del records[destination_id]
+        return True
+
+    def apply(self, records):
+        with self.store.update() as current:
+            return sync_records(current, records)
+
+    def records(self):
+        # Sorted by ID once per version, so the coordinator can merge shards in order
+        snapshot = self.store.snapshot()
+        if self._ordered is None or self._ordered[0] is not snapshot:
+            self._ordered = (snapshot, sorted(snapshot.records.values(), key=itemgetter("id")))
+        return snapshot.version, self._ordered[1]
+
+    def search(self, query):
+        return query.page(index_for(self.store.snapshot()))
+
+    def size(self):
+        return len(self.store.snapshot().records)
+
+
+def _serve(connection, records):
+    """
+    Shard worker loop: run each (method, args) request against the partition and send
+    back (True, result) or (False, exception). None or a closed pipe stops the worker.
+    """
+    partition = ShardPartition(records)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        method, args = message
+        try:
+            connection.send((True, getattr(partition, method)(*args)))
+        except Exception as e:
+            connection.send((False, e))
+
+
+class ShardedCatalog:
+    """
+    Destination catalog partitioned by ID hash across worker processes.
+
+    Point lookups, adds and deletes go to the one shard that owns the ID. Listings
+    and searches are sent to every shard at once; each one filters, sorts and cuts
+    its own partition in parallel, and the coordinator merges the sorted results.
+
+    A shard whose worker stops answering is marked down: its destinations are gone
+    with the process, so every later call that needs it raises ShardUnavailable.
+    """
+
+    def __init__(self, shards, records=None):
+        self.shards = shards
+        partitions = self.partition(records or {})
+        self._connections = []
+        self._locks = []
+        self._processes = []
+        self._down = set()
+        for number, partition in enumerate(partitions):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve, args=(child, partition), name=f"destination-shard-{number}", daemon=True
+            )
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+        self._pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="shard-scatter")
+
+    def partition(self, records):
+        partitions = [{} for _ in range(self.shards)]
+        for key, record in records.items():
+            partitions[shard_for(key, self.shards)][key] = record
+        return partitions
+
+    def _call(self, shard, method, *args):
+        with self._locks[shard]:
+            if shard in self._down:
+                raise ShardUnavailable(f"Destination shard {shard} is down")
+            try:
+                self._connections[shard].send((method, args))
+                ok, result = self._connections[shard].recv()
+            except (EOFError, OSError) as e:
+                self._down.add(shard)
+                logger.error(
+                    "Destination shard %d stopped answering (exit code %s)", shard, self._processes[shard].exitcode
+                )
+                raise ShardUnavailable(f"Destination shard {shard} is down") from e
+        if not ok:
+            raise result
+        return result
+
+    def down(self):
+        """
+        Shards whose worker has stopped answering.
+        """
+        return sorted(self._down)
+
+    def _scatter(self, method, *args):
+        return list(self._pool.map(lambda shard: self._call(shard, method, *args), range(self.shards)))
+
+    def get(self, destination_id):
+        return self._call(shard_for(destination_id, self.shards), "get", destination_id)
+
+    def add(self, record):
+        """
+        Add a destination to its shard. Returns False if the ID already exists.
+        """
+        return self._call(shard_for(record["id"], self.shards), "add", record)
+
+    def delete(self, destination_id):
+        """
+        Remove a destination from its shard. Returns False if it doesn't exist.
+        """
+        return self._call(shard_for(destination_id, self.shards), "delete", destination_id)
+
+    def version(self):
+        """
+        Sum of the shard versions: it grows with every change to any shard.
+        """
+        return sum(self._scatter("version"))
+
+    def size(self):
+        return sum(self._scatter("size"))
+
+    def records(self):
+        """
+        Return (version, every destination ordered by ID).
+        """
+        results = self._scatter("records")
+        return sum(version for version, _ in results), list(merge(*(records for _, records in results), key=itemgetter("id")))
+
+    def search(self, query):
+        """
+        Run a SearchQuery on every shard. Returns (total matches, requested page).
+        """
+        return query.merge(self._scatter("search", query))
+
+    def replace(self, records):
+        """
+        Make the sharded catalog match `records`. Each shard applies only what changed
+        in its partition. Returns (added, updated, removed) counts.
+        """
+        partitions = self.partition(records)
+        results = list(self._pool.map(lambda shard: self._call(shard, "apply", partitions[shard]), range(self.shards)))
+        return tuple(map(sum, zip(*results)))
+
+    def close(self):
+        for shard, connection in enumerate(self._connections):
+            with self._locks[shard]:
+                if shard not in self._down:
+                    try:
+                        connection.send(None)
+                    except OSError:
+                        pass
+                connection.close()
+        for process in self._processes:
+            process.join(timeout=5)
+        self._pool.shutdown()
@@ -0,0 +1,154 @@
+import json
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+# sequence, version, admin payload length, public payload length
+HEADER = struct.Struct("<QQQQ")
+SEQUENCE = struct.Struct("<Q")
+
+DEFAULT_SIZE = 64 * 1024 * 1024
+
+# Readers that find a write in progress spin briefly, then back off, and give up after
+# READ_TIMEOUT seconds: a writer that died mid-write leaves the sequence odd for good
+READ_SPINS = 100
+READ_TIMEOUT = 1.0
+MAX_BACKOFF = 0.01
+
+
+class CatalogTooLarge(Exception):
+    pass
+
+
+class CatalogReadTimeout(Exception):
+    pass
+
+
+def _read_attempts():
+    for _ in range(READ_SPINS):
+        yield
+    delay = 0.0001
+    deadline = time.monotonic() + READ_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_BACKOFF)
+        yield
+    raise CatalogReadTimeout(f"Shared catalog write did not finish within {READ_TIMEOUT}s")
+
+
+class SharedCatalog:
+    """
+    Destination catalog kept in one shared memory segment for every process serving
+    requests. Werkzeug forks one process per request, so changes made in one have to
+    reach every later one through the segment.
+
+    The writer serializes the catalog once per change into two ready-to-send JSON
+    payloads (with and without the `id` field) behind a sequence lock. Readers
+    copy a payload straight out of the segment without decoding it, so every
+    process serves the same versioned snapshot from a single resident copy.
+    """
+
+    def __init__(self, name=None, size=DEFAULT_SIZE, create=False, lock=None):
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self._shm.buf, 0, 0, 0, 0, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Attaching must not hand ownership of the segment to this process's resource tracker
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.name = self._shm.name
+        self.owner = create
+        self._owner_pid = os.getpid()
+        # multiprocessing.Lock shared by every process that writes
+        self._lock = lock
+        self._written = threading.local()
+
+    def _header(self):
+        return HEADER.unpack_from(self._shm.buf, 0)
+
+    @property
+    def version(self):
+        for _ in _read_attempts():
+            sequence, version, _, _ = self._header()
+            if not sequence & 1:
+                return version
+
+    def read(self, include_ids=True):
+        """
+        Return (version, payload) where payload is the serialized catalog as JSON bytes.
+        Retries if a write lands while the payload is being copied, and raises
+        CatalogReadTimeout if no write completes within READ_TIMEOUT.
+        """
+        buf = self._shm.buf
+        for _ in _read_attempts():
+            sequence, version, admin_length, public_length = self._header()
+            if sequence & 1:
+                continue
+            start = HEADER.size if include_ids else HEADER.size + admin_length
+            length = admin_length if include_ids else public_length
+            payload = bytes(buf[start:start + length])
+            if SEQUENCE.unpack_from(buf, 0)[0] == sequence:
+                return version, payload
+
+    def read_records(self):
+        """
+        Return (version, records) with the catalog decoded into a dict keyed by destination ID.
+        """
+        version, payload = self.read()
+        return version, {record["id"]: record for record in json.loads(payload or b"[]")}
+
+    def records(self):
+        return self.read_records()[1]
+
+    def publish(self, records):
+        admin = json.dumps(list(records.values())).encode()
+        public = json.dumps([
+            {key: value for key, value in record.items() if key != "id"}
+            for record in records.values()
+        ]).encode()
+        if HEADER.size + len(admin) + len(public) > self._shm.size:
+            raise CatalogTooLarge(f"Catalog needs {len(admin) + len(public)} bytes, segment holds {self._shm.size}")
+
+        buf = self._shm.buf
+        sequence, version, _, _ = self._header()
+        # An odd sequence tells readers a write is in progress
+        SEQUENCE.pack_into(buf, 0, sequence + 1)
+        buf[HEADER.size:HEADER.size + len(admin)] = admin
+        buf[HEADER.size + len(admin):HEADER.size + len(admin) + len(public)] = public
+        HEADER.pack_into(buf, 0, sequence + 2, version + 1, len(admin), len(public))
+
+    @contextmanager
+    def writing(self):
+        """
+        Yield the current catalog for modification and publish it if it changed.
+        Writers in different processes are serialized by the shared lock.
+        """
+        if self._lock is not None:
+            self._lock.acquire()
+        try:
+            records = self.records()
+            before = dict(records)
+            yield records
+            if records != before:
+                self.publish(records)
+            self._written.version = self.version
+        finally:
+            if self._lock is not None:
+                self._lock.release()
+
+    def written_version(self):
+        """
+        Version left by the calling thread's last writing() block.
+        """
+        return self._written.version
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        # Forked request processes inherit this object; only the creating process removes the segment
+        if self.owner and os.getpid() == self._owner_pid:
+            self._shm.unlink()
@@ -0,0 +1,166 @@
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+import numpy as np
+from shared.config import Config
+
+TOKEN = re.compile(r"[a-z0-9]+")
+TEXT_FIELDS = ("name", "description", "location")
+
+
+def _log_price(record):
+    # A price that isn't a finite number counts as free rather than failing the whole index
+    try:
+        price = float(record["price_per_night"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    return math.log1p(max(price, 0.0)) if math.isfinite(price) else 0.0
+
+
+class SimilarityIndex:
+    """
+    TF-IDF vectors of each destination's name, description and location, hashed into
+    a fixed number of columns of one NumPy matrix, plus a price column.
+
+    Rows are added and removed incrementally from the catalog's change log: a new or
+    changed destination costs one row write and a document-frequency update, a deleted
+    one frees its row for reuse. IDF weights and row norms are computed lazily,
+    once per catalog version, and top-K neighbor lists are cached until the next version.
+    """
+
+    def __init__(self, dimensions=None, price_weight=None, max_k=None):
+        self.dimensions = dimensions or Config.SIMILARITY_DIMENSIONS
+        self.price_weight = Config.SIMILARITY_PRICE_WEIGHT if price_weight is None else price_weight
+        self.max_k = max_k or Config.SIMILAR_MAX_K
+        self.version = None
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._ids = []
+        self._free = []
+        self._tf = np.zeros((0, self.dimensions), dtype=np.float32)
+        self._tf_squared = np.zeros((0, self.dimensions), dtype=np.float32)
+        self._log_prices = np.zeros(0, dtype=np.float64)
+        self._active = np.zeros(0, dtype=bool)
+        self._df = np.zeros(self.dimensions, dtype=np.int64)
+        self._weights = None
+        self._neighbors = {}
+
+    def _term_frequencies(self, record):
+        counts = Counter(
+            zlib.crc32(token.encode()) % self.dimensions
+            for field in TEXT_FIELDS
+            if isinstance(record.get(field), str)
+            for token in TOKEN.findall(record[field].lower())
+        )
+        row = np.zeros(self.dimensions, dtype=np.float32)
+        if counts:
+            columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            row[columns] = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        return row
+
+    def _allocate(self, destination_id):
+        if self._free:
+            row = self._free.pop()
+            self._ids[row] = destination_id
+        else:
+            row = len(self._ids)
+            self._ids.append(destination_id)
+            if row == len(self._tf):
+                capacity = max(16, 2 * row)
+                self._tf = np.resize(self._tf, (capacity, self.dimensions))
+                self._tf[row:] = 0
+                self._tf_squared = np.resize(self._tf_squared, (capacity, self.dimensions))
+                self._tf_squared[row:] = 0
+                self._log_prices = np.resize(self._log_prices, capacity)
+                self._active = np.resize(self._active, capacity)
+                self._active[row:] = False
+        self._rows[destination_id] = row
+        return row
+
+    def _remove(self, destination_id):
+        row = self._rows.pop(destination_id, None)
+        if row is None:
+            return
+        self._df -= self._tf[row] > 0
+        self._tf[row] = 0
+        self._tf_squared[row] = 0
+        self._active[row] = False
+        self._ids[row] = None
+        self._free.append(row)
+
+    def _upsert(self, record):
+        destination_id = record["id"]
+        self._remove(destination_id)
+        row = self._allocate(destination_id)
+        self._tf[row] = self._term_frequencies(record)
+        self._tf_squared[row] = self._tf[row] ** 2
+        self._df += self._tf[row] > 0
+        self._log_prices[row] = _log_price(record)
+        self._active[row] = True
+
+    def sync(self, snapshot):
+        """
+        Bring the index up to `snapshot`, applying only the changes since the last sync
+        when the change log still covers them.
+        """
+        if snapshot.version == self.version:
+            return
+        with self._lock:
+            if snapshot.version == self.version:
+                return
+            delta = snapshot.delta(self.version) if self.version is not None else None
+            if delta is None:
+                for destination_id in list(self._rows):
+                    self._remove(destination_id)
+                upserted, deleted = list(snapshot.records.values()), []
+            else:
+                upserted, deleted = delta
+            for destination_id in deleted:
+                self._remove(destination_id)
+            for record in upserted:
+                self._upsert(record)
+            self._weights = None
+            self._neighbors = {}
+            self.version = snapshot.version
+
+    def _idf_and_norms(self):
+        # TF-IDF vectors are never materialized: a row's norm is sqrt(tf^2 . idf^2),
+        # one matrix-vector product per version instead of reweighting the whole matrix
+        if self._weights is None:
+            documents = int(self._active.sum())
+            idf_squared = (np.log((1 + documents) / (1 + self._df)).astype(np.float32) + 1) ** 2
+            norms = np.sqrt(self._tf_squared @ idf_squared)
+            self._weights = idf_squared, np.where(norms == 0, 1, norms)
+        return self._weights
+
+    def similar(self, destination_id, k=None):
+        """
+        Up to `k` (destination ID, score) pairs most similar to `destination_id`, best first.
+        Raises KeyError for an unknown destination.
+        """
+        k = min(k or self.max_k, self.max_k)
+        neighbors = self._neighbors.get(destination_id)
+        if neighbors is None:
+            with self._lock:
+                row = self._rows[destination_id]
+                idf_squared, norms = self._idf_and_norms()
+                text = (self._tf @ (self._tf[row] * idf_squared)) / (norms * norms[row])
+                price = np.exp(-np.abs(self._log_prices - self._log_prices[row]))
+                scores = (1 - self.price_weight) * text + self.price_weight * price
+                scores[~self._active] = -np.inf
+                scores[row] = -np.inf
+
+                count = min(self.max_k, int(self._active.sum()) - 1)
+                if count > 0:
+                    top = np.argpartition(-scores, count - 1)[:count]
+                    top = top[np.argsort(-scores[top], kind="stable")]
+                else:
+                    top = []
+                neighbors = [(self._ids[i], round(float(scores[i]), 4)) for i in top]
+                self._neighbors[destination_id] = neighbors
+        return neighbors[:k]
+
+
+index = SimilarityIndex()
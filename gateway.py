@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import time
+from urllib.parse import unquote, urlparse
+import aiohttp
+from aiohttp import web
+from shared import upstream
+from shared.config import Config
+from shared.log import setup_logging
+
+
+def split_service_url(url):
+    """
+    Return (Unix socket path, base URL) for a service URL; the socket path is None over TCP.
+    """
+    if url.startswith("http+unix://"):
+        return unquote(urlparse(url).netloc), "http://localhost"
+    return None, url
+
+
+SERVICES = {
+    "auth": split_service_url(Config.AUTH_SERVICE_URL),
+    "user": split_service_url(Config.USER_SERVICE_URL),
+    "destination": split_service_url(Config.DESTINATION_SERVICE_URL),
+}
+AUTH_SERVICE_URL = SERVICES["auth"][1]
+USER_SERVICE_URL = SERVICES["user"][1]
+DESTINATION_SERVICE_URL = SERVICES["destination"][1]
+GATEWAY_HOST = Config.GATEWAY_HOST
+GATEWAY_PORT = Config.GATEWAY_PORT
+
+# Keep-alive pool shared by every composite request
+POOL_SIZE = 100
+POOL_KEEPALIVE = 30
+# Connections opened to each backing service before the gateway reports ready
+WARM_CONNECTIONS = 4
+
+client_key = web.AppKey("client", aiohttp.ClientSession)
+# Session per backing service: the shared TCP pool, or a pool on the service's Unix socket
+sessions_key = web.AppKey("sessions", dict)
+warm_up_key = web.AppKey("warm_up", dict)
+
+
+class UpstreamError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def fetch_json(session, name, url, headers=None):
+    """
+    GET a JSON document from a backing service through its circuit breaker.
+    Returns (status, body); raises UpstreamError if the service can't be reached.
+    """
+    breaker = upstream.get_breaker(name)
+    trial = breaker.admit()
+    if trial is None:
+        raise UpstreamError(503, f"{name} service unavailable (circuit open)")
+
+    connect, read = Config.UPSTREAM_TIMEOUTS.get(name, Config.UPSTREAM_DEFAULT_TIMEOUT)
+    timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    try:
+        async with session.get(url, headers=headers, timeout=timeout) as response:
+            body = await response.json(content_type=None)
+        if response.status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        breaker.record_failure()
+        raise UpstreamError(502, f"{name} service unavailable: {e}")
+    except BaseException:
+        # Cancelled before an outcome: free the half-open trial if this call holds it, and no other
+        if trial:
+            breaker.release_trial()
+        raise
+    return response.status, body
+
+
+def message(body, default):
+    """
+    The "message" of an upstream JSON error body, which may not be an object.
+    """
+    return body.get("message", default) if isinstance(body, dict) else default
+
+
+async def resolve_token(sessions, request):
+    """
+    Use the caller's Authorization header, falling back to the User Service's active token.
+    """
+    token = request.headers.get("Authorization")
+    if token:
+        return token.replace("Bearer ", "")
+
+    status, body = await fetch_json(
+        sessions["user"], "user", f"{USER_SERVICE_URL}/_internal/get_token", headers={"X-Internal-Request": "true"}
+    )
+    if status != 200 or not isinstance(body, dict) or not body.get("access_token"):
+        raise UpstreamError(401, message(body, "No active token"))
+    return body["access_token"]
+
+
+async def home(request):
+    return web.Response(text="Welcome to the API Gateway!")
+
+
+async def dashboard(request):
+    """
+    Composite of the caller's profile and the destination catalog.
+    The token is validated up front, then forwarded to both services, queried concurrently,
+    so every part of the response belongs to the same caller.
+    """
+    sessions = request.app[sessions_key]
+    try:
+        token = await resolve_token(sessions, request)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        status, user_info = await fetch_json(sessions["auth"], "auth", f"{AUTH_SERVICE_URL}/validate", headers=headers)
+        if status != 200:
+            return web.json_response({"message": message(user_info, "Invalid token")}, status=401)
+        if not isinstance(user_info, dict):
+            raise UpstreamError(502, "auth service returned an unexpected response")
+
+        (profile_status, profile), (catalog_status, catalog) = await asyncio.gather(
+            fetch_json(sessions["user"], "user", f"{USER_SERVICE_URL}/profile", headers=headers),
+            fetch_json(sessions["destination"], "destination", f"{DESTINATION_SERVICE_URL}/destinations", headers=headers),
+        )
+    except UpstreamError as e:
+        return web.json_response({"message": e.message}, status=e.status)
+
+    for status, body in ((profile_status, profile), (catalog_status, catalog)):
+        if status != 200:
+            return web.json_response({"message": message(body, "Upstream error")}, status=status)
+
+    return web.json_response({"role": user_info.get("role"), "profile": profile, "destinations": catalog})
+
+
+async def healthz(request):
+    return web.json_response({"status": "ok", "service": "gateway"})
+
+
+async def readyz(request):
+    return web.json_response({"status": "ready", "service": "gateway", "warm_up": request.app[warm_up_key]})
+
+
+async def warm_pool(sessions):
+    """
+    Open keep-alive connections to every backing service so the first requests reuse them.
+    Returns how many connections were established per service.
+    """
+    async def touch(name):
+        try:
+            async with sessions[name].get(f"{SERVICES[name][1]}/healthz", timeout=aiohttp.ClientTimeout(total=2)) as response:
+                await response.read()
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    results = await asyncio.gather(*(touch(name) for name in SERVICES for _ in range(WARM_CONNECTIONS)))
+    return {
+        name: sum(results[i * WARM_CONNECTIONS:(i + 1) * WARM_CONNECTIONS])
+        for i, name in enumerate(SERVICES)
+    }
+
+
+async def client_session(app):
+    connector = aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=POOL_KEEPALIVE)
+    app[client_key] = aiohttp.ClientSession(connector=connector)
+    app[sessions_key] = {
+        name: aiohttp.ClientSession(connector=aiohttp.UnixConnector(
+            socket_path, limit=POOL_SIZE, keepalive_timeout=POOL_KEEPALIVE
+        )) if socket_path else app[client_key]
+        for name, (socket_path, _) in SERVICES.items()
+    }
+    started = time.perf_counter()
+    app[warm_up_key] = {
+        "connections": await warm_pool(app[sessions_key]),
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    yield
+    for session in {*app[sessions_key].values(), app[client_key]}:
+        await session.close()
+
+
+def create_app():
+    app = web.Application()
+    app.cleanup_ctx.append(client_session)
+    app.router.add_get("/", home)
+    app.router.add_get("/dashboard", dashboard)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/readyz", readyz)
+    return app
+
+
+if __name__ == '__main__':
+    setup_logging("gateway")
+    logging.info(f"Starting gateway on http://{GATEWAY_HOST}:{GATEWAY_PORT}")
+    web.run_app(create_app(), host=GATEWAY_HOST, port=GATEWAY_PORT)
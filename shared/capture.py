@@ -0,0 +1,161 @@
+import atexit
+import io
+import json
+import queue
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+from shared.config import Config
+
+REDACTED = "<redacted>"
+# JSON fields and query parameters that are never written to a capture
+SECRET_FIELDS = {"password", "token", "access_token", "refresh_token", "secret"}
+# Headers kept in a capture; the credential ones only as a marker that they were sent
+CAPTURED_HEADERS = ("Content-Type", "Accept", "Authorization", "X-Internal-Request", "X-Caller-Service")
+SECRET_HEADERS = {"Authorization"}
+# Tooling and probe traffic isn't worth replaying
+SKIPPED_PREFIXES = ("/healthz", "/readyz", "/apidocs", "/apispec", "/flasgger_static")
+
+
+def scrub(value):
+    """
+    Copy of a decoded JSON body with every secret field replaced by a marker.
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if key in SECRET_FIELDS else scrub(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    return value
+
+
+def scrub_query(query):
+    pairs = parse_qsl(query, keep_blank_values=True)
+    return urlencode([(key, REDACTED if key in SECRET_FIELDS else value) for key, value in pairs])
+
+
+class CaptureWriter:
+    """
+    Append captured requests to a JSON-lines file from a background thread.
+    Records are dropped rather than blocking a request when the buffer is full.
+    """
+
+    def __init__(self, path, buffer_size=None):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=buffer_size or Config.CAPTURE_BUFFER_SIZE)
+        self._thread = threading.Thread(target=self._write, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        with open(self.path, "a") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class CaptureMiddleware:
+    """
+    WSGI middleware recording each request's metadata, scrubbed body, status and duration.
+    """
+
+    def __init__(self, app, service, writer, max_body=None):
+        self.wsgi_app = app.wsgi_app
+        self.url_map = app.url_map
+        self.service = service
+        self.writer = writer
+        self.max_body = max_body or Config.CAPTURE_MAX_BODY
+
+    def _endpoint(self, environ):
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+            return endpoint
+        except Exception:
+            return None
+
+    def _record(self, environ, body, received, status, duration_ms):
+        record = {
+            "ts": received,
+            "service": self.service,
+            "endpoint": self._endpoint(environ),
+            "method": environ["REQUEST_METHOD"],
+            "path": environ.get("PATH_INFO", ""),
+            "query": scrub_query(environ.get("QUERY_STRING", "")),
+            "headers": {},
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+        }
+        for name in CAPTURED_HEADERS:
+            value = environ.get("CONTENT_TYPE" if name == "Content-Type" else "HTTP_" + name.upper().replace("-", "_"))
+            if value:
+                record["headers"][name] = REDACTED if name in SECRET_HEADERS else value
+        if len(body) > self.max_body:
+            record["body_truncated"] = True
+        elif body:
+            try:
+                record["json"] = scrub(json.loads(body))
+            except ValueError:
+                # Secrets can't be found in a body that doesn't parse, so none of it is kept
+                record["body_length"] = len(body)
+                record["unparsed"] = True
+        return record
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO", "").startswith(SKIPPED_PREFIXES):
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        body = b""
+        # Bodies without a length (chunked uploads) are left to the app and not captured
+        if length > 0:
+            body = environ["wsgi.input"].read(length)
+            # The app still needs to read the body we just consumed
+            environ["wsgi.input"] = io.BytesIO(body)
+        statuses = []
+
+        def capture_status(status, headers, exc_info=None):
+            statuses.append(int(status.split(" ", 1)[0]))
+            return start_response(status, headers, exc_info)
+
+        received, started = time.time(), time.perf_counter()
+        try:
+            return self.wsgi_app(environ, capture_status)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            self.writer.write(self._record(environ, body, received, statuses[0] if statuses else 500, duration_ms))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def init_app(app, service):
+    """
+    Capture the app's traffic to CAPTURE_FILE when it is set. Services in one process
+    share a single writer and file.
+    """
+    global _writer
+    if not Config.CAPTURE_FILE:
+        return None
+    with _writer_lock:
+        if _writer is None:
+            _writer = CaptureWriter(Config.CAPTURE_FILE)
+            atexit.register(_writer.close)
+    app.wsgi_app = CaptureMiddleware(app, service, _writer)
+    return app.wsgi_app
@@ -1,5 +1,13 @@
 import os
 import secrets
+from urllib.parse import quote
+
+
+def _service_url(name, port):
+    socket_dir = os.environ.get("SERVICE_SOCKET_DIR")
+    if socket_dir:
+        return "http+unix://" + quote(os.path.join(socket_dir, f"{name}.sock"), safe="")
+    return f"http://localhost:{port}"
 
 class Config:
     # Path to store the generated SECRET_KEY
@@ -14,3 +22,101 @@ class Config:
         SECRET_KEY = secrets.token_urlsafe(32)
         with open(SECRET_KEY_FILE, 'w') as f:
             f.write(SECRET_KEY)
+
+    # Inter-service call policy: (connect, read) timeouts in seconds per upstream
+    UPSTREAM_TIMEOUTS = {
+        "auth": (float(os.environ.get("AUTH_CONNECT_TIMEOUT", 0.5)), float(os.environ.get("AUTH_READ_TIMEOUT", 2.0))),
+        "user": (float(os.environ.get("USER_CONNECT_TIMEOUT", 0.5)), float(os.environ.get("USER_READ_TIMEOUT", 2.0))),
+    }
+    UPSTREAM_DEFAULT_TIMEOUT = (0.5, 5.0)
+    # Extra attempts for idempotent calls and the base delay for jittered backoff
+    UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 2))
+    UPSTREAM_BACKOFF = float(os.environ.get("UPSTREAM_BACKOFF", 0.05))
+    # Keep-alive connections kept open per upstream host or socket
+    UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 20))
+    # Consecutive failures that trip a breaker, and how long it stays open
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 5))
+    BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", 10.0))
+
+    # Most destination requests served at once in forked processes (werkzeug forks one
+    # per request); above 1 the catalog is served from shared memory
+    DESTINATION_PROCESSES = int(os.environ.get("DESTINATION_PROCESSES", 1))
+    SHARED_CATALOG_SIZE = int(os.environ.get("SHARED_CATALOG_SIZE", 64 * 1024 * 1024))
+    # Shard worker processes; above 1 destinations are partitioned across them by ID hash
+    DESTINATION_SHARDS = int(os.environ.get("DESTINATION_SHARDS", 1))
+
+    # GET /destinations/search: largest page, and deepest offset a page can start at
+    DESTINATION_SEARCH_LIMIT = int(os.environ.get("DESTINATION_SEARCH_LIMIT", 500))
+    DESTINATION_SEARCH_MAX_OFFSET = int(os.environ.get("DESTINATION_SEARCH_MAX_OFFSET", 10000))
+
+    # Catalog versions kept in the change log for delta sync
+    CATALOG_CHANGELOG_SIZE = int(os.environ.get("CATALOG_CHANGELOG_SIZE", 1000))
+
+    # Server-sent event stream: events buffered per subscriber and keep-alive interval in seconds
+    STREAM_BUFFER_SIZE = int(os.environ.get("STREAM_BUFFER_SIZE", 100))
+    STREAM_KEEPALIVE = float(os.environ.get("STREAM_KEEPALIVE", 15.0))
+
+    # Trip quotes: price multiplier per month (January first), and (minimum nights, discount rate) tiers
+    SEASONAL_MULTIPLIERS = [0.9, 0.9, 1.0, 1.0, 1.05, 1.2, 1.25, 1.25, 1.05, 1.0, 0.95, 1.2]
+    LENGTH_OF_STAY_DISCOUNTS = [(7, 0.10), (28, 0.20)]
+    QUOTE_MAX_LINES = int(os.environ.get("QUOTE_MAX_LINES", 200000))
+
+    # Most tokens POST /generate_tokens signs in one request, and the roles it may sign for
+    TOKEN_BATCH_LIMIT = int(os.environ.get("TOKEN_BATCH_LIMIT", 10000))
+    TOKEN_BATCH_ROLES = tuple(os.environ.get("TOKEN_BATCH_ROLES", "User").split(","))
+
+    # Structured logging: records buffered for the writer thread, and sampling of high-volume messages
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    LOG_SAMPLE_BURST = int(os.environ.get("LOG_SAMPLE_BURST", 10))
+    LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", 100))
+
+    # Tracing: finished spans kept in memory, and an optional JSON-lines file to export them to
+    TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", 10000))
+    TRACE_FILE = os.environ.get("TRACE_FILE")
+
+    # Seconds travel_api.py waits for every service to come up and finish warming up,
+    # and between retries of warm-up tasks that failed
+    STARTUP_TIMEOUT = float(os.environ.get("STARTUP_TIMEOUT", 30.0))
+    READINESS_RETRY_INTERVAL = float(os.environ.get("READINESS_RETRY_INTERVAL", 1.0))
+
+    # Optional catalog file (.csv, .jsonl or .json) the destination service loads and watches
+    DESTINATION_CATALOG_FILE = os.environ.get("DESTINATION_CATALOG_FILE")
+    CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", 1.0))
+
+    # Serialized catalog projections cached for the current catalog version
+    PROJECTION_CACHE_SIZE = int(os.environ.get("PROJECTION_CACHE_SIZE", 16))
+
+    # Most operations accepted by POST /destinations/batch
+    DESTINATION_BATCH_LIMIT = int(os.environ.get("DESTINATION_BATCH_LIMIT", 1000))
+
+    # Similar-destination recommendations: hashed TF-IDF columns, weight of price
+    # proximity against text similarity, and the most neighbors cached per destination
+    SIMILARITY_DIMENSIONS = int(os.environ.get("SIMILARITY_DIMENSIONS", 512))
+    SIMILARITY_PRICE_WEIGHT = float(os.environ.get("SIMILARITY_PRICE_WEIGHT", 0.2))
+    SIMILAR_MAX_K = int(os.environ.get("SIMILAR_MAX_K", 20))
+
+    # Nights ahead of today that can be booked per destination, and the
+    # most results GET /destinations/available returns per request
+    AVAILABILITY_DAYS = int(os.environ.get("AVAILABILITY_DAYS", 730))
+    AVAILABILITY_SEARCH_LIMIT = int(os.environ.get("AVAILABILITY_SEARCH_LIMIT", 100))
+
+    # Where the services listen and how they reach each other. With SERVICE_SOCKET_DIR set,
+    # co-located services serve and call each other over Unix domain sockets in that
+    # directory instead of loopback TCP. Each URL can also be overridden on its own.
+    SERVICE_SOCKET_DIR = os.environ.get("SERVICE_SOCKET_DIR")
+    USER_SERVICE_PORT = int(os.environ.get("USER_SERVICE_PORT", 5000))
+    AUTH_SERVICE_PORT = int(os.environ.get("AUTH_SERVICE_PORT", 5001))
+    DESTINATION_SERVICE_PORT = int(os.environ.get("DESTINATION_SERVICE_PORT", 5002))
+    USER_SERVICE_URL = os.environ.get("USER_SERVICE_URL") or _service_url("user", USER_SERVICE_PORT)
+    AUTH_SERVICE_URL = os.environ.get("AUTH_SERVICE_URL") or _service_url("auth", AUTH_SERVICE_PORT)
+    DESTINATION_SERVICE_URL = os.environ.get("DESTINATION_SERVICE_URL") or _service_url("destination", DESTINATION_SERVICE_PORT)
+    # The asyncio gateway always listens on TCP
+    GATEWAY_HOST = os.environ.get("GATEWAY_HOST", "localhost")
+    GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", 5003))
+
+    # Opt-in traffic capture for load replay: JSON-lines file shared by the services,
+    # largest request body recorded, and records buffered before new ones are dropped
+    CAPTURE_FILE = os.environ.get("CAPTURE_FILE")
+    CAPTURE_MAX_BODY = int(os.environ.get("CAPTURE_MAX_BODY", 64 * 1024))
+    CAPTURE_BUFFER_SIZE = int(os.environ.get("CAPTURE_BUFFER_SIZE", 10000))
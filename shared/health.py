@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from flask import jsonify, request
+from shared.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Warm-up tasks for one service and whether all of them have succeeded.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.warmers = []
+        self.report = {}
+        self._ready = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def add_warmer(self, warmer):
+        self.warmers.append(warmer)
+        return warmer
+
+    def warm_up(self):
+        """
+        Run every warmer that hasn't succeeded yet. The service is ready once all of
+        them have; a failing warmer is logged and reported, and run again next time.
+        """
+        with self._lock:
+            return self._warm_up()
+
+    def _warm_up(self):
+        started = time.perf_counter()
+        for warmer in self.warmers:
+            if self.report.get(warmer.__name__, {}).get("result") == "ok":
+                continue
+            warmer_started = time.perf_counter()
+            try:
+                warmer()
+                outcome = "ok"
+            except Exception as e:
+                logger.warning("Warm-up %s.%s failed: %s", self.service, warmer.__name__, e)
+                outcome = f"failed: {e}"
+            self.report[warmer.__name__] = {
+                "result": outcome,
+                "duration_ms": round((time.perf_counter() - warmer_started) * 1000, 2),
+            }
+        self.report["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if all(self.report[warmer.__name__]["result"] == "ok" for warmer in self.warmers):
+            self._ready.set()
+        return self.report
+
+    def warm_up_until_ready(self, interval=None):
+        """
+        Warm up now and, if any warmer failed, keep retrying the failed ones from a
+        background thread every `interval` seconds until the service is ready.
+        """
+        with self._lock:
+            self._started = True
+        self.warm_up()
+        if not self.ready:
+            interval = interval or Config.READINESS_RETRY_INTERVAL
+            threading.Thread(target=self._retry, args=(interval,), name=f"{self.service}-warm-up", daemon=True).start()
+        return self.report
+
+    def start(self, interval=None):
+        """
+        Warm up until ready from a background thread, unless warm-up has already started.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        interval = interval or Config.READINESS_RETRY_INTERVAL
+        threading.Thread(target=self._run, args=(interval,), name=f"{self.service}-warm-up", daemon=True).start()
+
+    def _run(self, interval):
+        self.warm_up()
+        self._retry(interval)
+
+    def _retry(self, interval):
+        while not self._ready.wait(interval):
+            self.warm_up()
+
+
+def init_app(app, service):
+    """
+    Add /healthz (the process is serving) and /readyz (every warm-up task has succeeded).
+    Warm-up starts in the background on the first request other than /healthz, so a service
+    run on its own becomes ready without an orchestrator. Test clients start it explicitly.
+    """
+    readiness = app.extensions["readiness"] = Readiness(service)
+
+    @app.before_request
+    def start_warm_up():
+        if not readiness._started and not app.testing and request.endpoint != "healthz":
+            readiness.start()
+
+    def healthz():
+        return jsonify({"status": "ok", "service": service}), 200
+
+    def readyz():
+        if not readiness.ready:
+            return jsonify({"status": "warming_up", "service": service, "warm_up": readiness.report}), 503
+        return jsonify({"status": "ready", "service": service, "warm_up": readiness.report}), 200
+
+    app.add_url_rule("/healthz", "healthz", healthz, methods=["GET"])
+    app.add_url_rule("/readyz", "readyz", readyz, methods=["GET"])
+    return readiness
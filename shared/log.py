@@ -0,0 +1,154 @@
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from flask import g, request
+from shared.config import Config
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Fields passed as extra={"fields": {...}} are merged in.
+    """
+
+    def __init__(self, service=None):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if self.service:
+            entry["service"] = self.service
+        for key in ("request_id", "suppressed"):
+            if getattr(record, key, None):
+                entry[key] = getattr(record, key)
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamp records with the ID of the request being handled on this thread.
+    """
+
+    def filter(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limit high-volume messages, marked with extra={"sample": True}.
+    Per message template, the first `burst` records of each second pass, then one in
+    `every`. A passing record carries how many were suppressed before it.
+    """
+
+    def __init__(self, burst=None, every=None):
+        super().__init__()
+        self.burst = burst or Config.LOG_SAMPLE_BURST
+        self.every = every or Config.LOG_SAMPLE_EVERY
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False):
+            return True
+        key = (record.name, record.msg)
+        second = int(time.monotonic())
+        with self._lock:
+            window, seen, suppressed = self._windows.get(key, (second, 0, 0))
+            if window != second:
+                window, seen = second, 0
+            seen += 1
+            keep = seen <= self.burst or seen % self.every == 0
+            if keep:
+                record.suppressed = suppressed
+                suppressed = 0
+            else:
+                suppressed += 1
+            self._windows[key] = (window, seen, suppressed)
+        return keep
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to the background listener without ever waiting: when the
+    queue is full the record is dropped and counted instead.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(service=None, level=None, stream=None):
+    """
+    Route the root logger through a bounded queue to a background thread that
+    writes JSON lines, so request threads never block on log I/O. Idempotent.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter(service))
+    log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level or Config.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def init_app(app):
+    """
+    Give every request an ID, taken from X-Request-ID when the caller sent one,
+    and echo it on the response.
+    """
+
+    @app.before_request
+    def _assign_request_id():
+        g.request_id_token = request_id_var.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex)
+
+    @app.after_request
+    def _echo_request_id(response):
+        response.headers["X-Request-ID"] = request_id_var.get() or ""
+        return response
+
+    @app.teardown_request
+    def _clear_request_id(exc):
+        token = g.pop("request_id_token", None)
+        if token is not None:
+            request_id_var.reset(token)
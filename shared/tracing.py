@@ -0,0 +1,203 @@
+import atexit
+import collections
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, request
+from shared.config import Config
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "service", "trace_id", "span_id", "parent_id", "start", "duration_ms", "attributes", "_started")
+
+    def __init__(self, name, service, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.service = service
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration_ms = None
+        self.attributes = dict(attributes or {})
+        self._started = time.perf_counter()
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        for exporter in exporters:
+            exporter.export(self)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "service": self.service,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+class InMemoryCollector:
+    """
+    Keep the most recent finished spans in memory, e.g. for the benchmark suite.
+    """
+
+    def __init__(self, maxlen=None):
+        self._spans = collections.deque(maxlen=maxlen or Config.TRACE_BUFFER_SIZE)
+
+    def export(self, span):
+        self._spans.append(span)
+
+    def spans(self, trace_id=None, name=None):
+        return [
+            span for span in list(self._spans)
+            if (trace_id is None or span.trace_id == trace_id) and (name is None or span.name == name)
+        ]
+
+    def clear(self):
+        self._spans.clear()
+
+
+class FileExporter:
+    """
+    Append finished spans to a JSON-lines file from a background thread.
+    Spans are dropped rather than blocking when the buffer is full.
+    """
+
+    def __init__(self, path, buffer_size=None):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=buffer_size or Config.TRACE_BUFFER_SIZE)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        with open(self.path, "a") as f:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    return
+                f.write(json.dumps(entry) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+collector = InMemoryCollector()
+exporters = [collector]
+if Config.TRACE_FILE:
+    _file_exporter = FileExporter(Config.TRACE_FILE)
+    exporters.append(_file_exporter)
+    atexit.register(_file_exporter.close)
+
+
+def parse_traceparent(header):
+    """
+    Return (trace_id, parent span_id) from a W3C traceparent header, or None.
+    """
+    parts = (header or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def start_span(name, service=None, traceparent=None, **attributes):
+    """
+    Start a span as a child of the current one, or of an incoming traceparent,
+    or as the root of a new trace.
+    """
+    parent = current_span.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id = remote
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+    if service is None and parent is not None:
+        service = parent.service
+    return Span(name, service, trace_id, parent_id, attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child span of the current span.
+    """
+    current = start_span(name, **attributes)
+    token = current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        current.finish()
+
+
+def inject(headers):
+    """
+    Add the current span's traceparent to outgoing request headers.
+    """
+    current = current_span.get()
+    if current is None:
+        return headers
+    return {**headers, "traceparent": current.traceparent}
+
+
+def init_app(app, service):
+    """
+    Record a server span for every request, continuing the caller's trace when
+    it sent a traceparent header.
+    """
+
+    @app.before_request
+    def _start_request_span():
+        server_span = start_span(
+            f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+            service=service,
+            traceparent=request.headers.get("traceparent"),
+        )
+        g.trace_span = server_span
+        g.trace_token = current_span.set(server_span)
+
+    @app.after_request
+    def _record_status(response):
+        server_span = g.get("trace_span")
+        if server_span is not None:
+            server_span.attributes["status"] = response.status_code
+            response.headers["traceparent"] = server_span.traceparent
+        return response
+
+    @app.teardown_request
+    def _finish_request_span(exc):
+        server_span = g.pop("trace_span", None)
+        token = g.pop("trace_token", None)
+        if token is not None:
+            current_span.reset(token)
+        if server_span is not None:
+            if exc is not None:
+                server_span.attributes["error"] = type(exc).__name__
+            server_span.finish()
@@ -0,0 +1,232 @@
+import os
+import random
+import socket
+import threading
+import time
+from urllib.parse import unquote, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from shared.config import Config
+from shared import tracing
+from shared.log import request_id_var
+
+# HTTP methods that are safe to send more than once
+IDEMPOTENT_METHODS = {"get", "head", "options", "put", "delete"}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream cannot be reached or its breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Track consecutive failures for one upstream and short-circuit calls while it is failing.
+    After `reset_timeout` seconds a single trial call is let through (half-open);
+    its outcome decides whether the breaker closes again or re-opens.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else Config.BREAKER_RESET_TIMEOUT
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.short_circuited = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.admit() is not None
+
+    def admit(self):
+        """
+        Let a call through or short-circuit it. Returns None when it is short-circuited,
+        True when it is the half-open trial and False for a normal call.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """
+        Free a half-open trial whose call ended without an outcome, e.g. when it was cancelled.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "short_circuited": self.short_circuited,
+            }
+
+
+breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        if name not in breakers:
+            breakers[name] = CircuitBreaker(name)
+        return breakers[name]
+
+
+def stats():
+    """
+    Breaker state and trip counts for every upstream seen so far.
+    """
+    with _breakers_lock:
+        current = dict(breakers)
+    return {name: breaker.stats() for name, breaker in current.items()}
+
+
+def _backoff(attempt):
+    # Full jitter keeps retries from many threads from arriving in lockstep
+    time.sleep(random.uniform(0, Config.UPSTREAM_BACKOFF * (2 ** attempt)))
+
+
+class UnixConnection(HTTPConnection):
+    def __init__(self, socket_path, **kwargs):
+        super().__init__("localhost", **kwargs)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class UnixConnectionPool(HTTPConnectionPool):
+    def __init__(self, socket_path, **kwargs):
+        super().__init__("localhost", **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        return UnixConnection(self.socket_path, timeout=self.timeout.connect_timeout)
+
+
+class UnixAdapter(HTTPAdapter):
+    """
+    Send http+unix://<percent-encoded socket path>/<path> URLs over a Unix domain socket,
+    keeping a pool of open connections per socket.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def get_connection(self, url, proxies=None):
+        socket_path = unquote(urlparse(url).netloc)
+        with self._pools_lock:
+            pool = self._pools.get(socket_path)
+            if pool is None:
+                pool = self._pools[socket_path] = UnixConnectionPool(socket_path, maxsize=self._pool_maxsize)
+            return pool
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self):
+        with self._pools_lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+def _mount_adapters():
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, HTTPAdapter(pool_maxsize=Config.UPSTREAM_POOL_SIZE))
+    session.mount("http+unix://", UnixAdapter(pool_maxsize=Config.UPSTREAM_POOL_SIZE))
+
+
+# Keep-alive pools for every upstream call, over TCP and Unix domain sockets alike
+session = requests.Session()
+_mount_adapters()
+# A forked process must not share pooled sockets with its parent: give it pools of its own
+os.register_at_fork(after_in_child=_mount_adapters)
+
+
+def call(name, method, url, **kwargs):
+    """
+    Send an HTTP request to the named upstream with its configured timeout.
+    Idempotent methods are retried with jittered backoff on connection errors
+    and 5xx responses. Raises UpstreamUnavailable when the breaker is open or
+    every attempt failed to get a response.
+    """
+    breaker = get_breaker(name)
+    kwargs.setdefault("timeout", Config.UPSTREAM_TIMEOUTS.get(name, Config.UPSTREAM_DEFAULT_TIMEOUT))
+    request_id = request_id_var.get()
+    if request_id:
+        # Carry the caller's request ID so log lines line up across services
+        kwargs["headers"] = {**kwargs.get("headers", {}), "X-Request-ID": request_id}
+    caller = tracing.current_span.get()
+    if caller is not None and caller.service:
+        # Lets traffic capture tell service-to-service calls from client requests
+        kwargs["headers"] = {**kwargs.get("headers", {}), "X-Caller-Service": caller.service}
+    attempts = 1 + (Config.UPSTREAM_RETRIES if method.lower() in IDEMPOTENT_METHODS else 0)
+    send = getattr(session, method.lower())
+
+    last_error = None
+    for attempt in range(attempts):
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"{name} service unavailable (circuit open)")
+        try:
+            with tracing.span(f"upstream {name}", method=method.upper(), url=url, attempt=attempt + 1) as client_span:
+                response = send(url, **{**kwargs, "headers": tracing.inject(kwargs.get("headers", {}))})
+                client_span.attributes["status"] = response.status_code
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            breaker.record_failure()
+            last_error = e
+        else:
+            if response.status_code < 500:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                return response
+        if attempt < attempts - 1:
+            _backoff(attempt)
+    raise UpstreamUnavailable(f"{name} service unavailable: {last_error}")
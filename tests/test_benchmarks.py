@@ -0,0 +1,138 @@
+"""
+Microbenchmarks for the hot paths, checked against stored baselines.
+
+Timings depend on the machine, so they are opt-in: set RUN_BENCHMARKS=1 to run them.
+Each benchmark reports the best per-call time over several runs, divided by the time
+of a fixed pure-Python reference workload measured in the same run. Baselines store
+that relative cost, so they carry over between machines. A run fails when a relative
+cost exceeds its baseline by more than the benchmark's max_ratio, scaled by
+BENCHMARK_TOLERANCE. Set BENCHMARK_RESULTS to a path to write the timings there, and
+BENCHMARK_UPDATE_BASELINE=1 to record the current relative costs as the new baselines.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import time
+import timeit
+import pytest
+from werkzeug.security import generate_password_hash, check_password_hash
+from authentication_service import app as auth_app
+from authentication_service.routes import validate
+from authentication_service.utils import generate_token, validate_token
+from destination_service.models import DestinationStore
+from destination_service.projection import ADMIN, PUBLIC, renders
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+RESULTS_FILE = os.environ.get("BENCHMARK_RESULTS")
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", 1.0))
+UPDATE_BASELINE = os.environ.get("BENCHMARK_UPDATE_BASELINE") == "1"
+REPEAT = 5
+
+# Default allowed slowdown for benchmarks added without an explicit max_ratio
+DEFAULT_MAX_RATIO = 3.0
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get("RUN_BENCHMARKS") != "1" and not UPDATE_BASELINE,
+    reason="benchmarks are opt-in; set RUN_BENCHMARKS=1",
+)
+
+CATALOG = {
+    f"D{i:04d}": {
+        "id": f"D{i:04d}",
+        "name": f"Destination {i}",
+        "description": "Benchmark destination",
+        "location": "Nowhere",
+        "price_per_night": 100.0 + i % 50,
+    }
+    for i in range(1000)
+}
+SNAPSHOT = DestinationStore(CATALOG).snapshot()
+TOKEN = generate_token("bench@example.com", "User")
+PASSWORD_HASH = generate_password_hash("Bench@123")
+
+
+def call_validate_route():
+    with auth_app.test_request_context("/validate", headers={"Authorization": f"Bearer {TOKEN}"}):
+        validate()
+
+
+# name -> (function, calls per run)
+BENCHMARKS = {
+    "generate_token": (lambda: generate_token("bench@example.com", "User"), 2000),
+    "validate_token": (lambda: validate_token(TOKEN), 2000),
+    "validate_route": (call_validate_route, 500),
+    "project_public": (lambda: PUBLIC.project(CATALOG.values()), 50),
+    "project_admin": (lambda: ADMIN.project(CATALOG.values()), 500),
+    "render_destinations_cached": (lambda: renders.render(SNAPSHOT, PUBLIC), 5000),
+    "generate_password_hash": (lambda: generate_password_hash("Bench@123"), 2),
+    "check_password_hash": (lambda: check_password_hash(PASSWORD_HASH, "Bench@123"), 2),
+}
+
+
+def reference_workload():
+    # Plain interpreter work: integer formatting, dict building and sorting
+    return sorted({str(i): i * i for i in range(500)}.items(), reverse=True)
+
+
+def measure(fn, number, repeat=REPEAT):
+    """
+    Best per-call time in microseconds over `repeat` runs of `number` calls.
+    """
+    fn()
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return measure(reference_workload, 200)
+
+
+@pytest.fixture(scope="module")
+def results(reference):
+    timings = {}
+    yield timings
+    if RESULTS_FILE:
+        with open(RESULTS_FILE, "w") as f:
+            json.dump({
+                "recorded_at": time.time(),
+                "reference_microseconds": reference,
+                "microseconds": timings,
+            }, f, indent=2, sort_keys=True)
+    if UPDATE_BASELINE:
+        baseline = load_baseline()
+        for name, microseconds in timings.items():
+            entry = baseline.setdefault(name, {"max_ratio": DEFAULT_MAX_RATIO})
+            entry.pop("microseconds", None)
+            entry["relative"] = round(microseconds / reference, 4)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_benchmark(name, results, reference):
+    fn, number = BENCHMARKS[name]
+    microseconds = results[name] = measure(fn, number)
+    relative = microseconds / reference
+
+    baseline = load_baseline().get(name)
+    if UPDATE_BASELINE:
+        return
+    if baseline is None:
+        pytest.skip(f"No baseline for {name}; run with BENCHMARK_UPDATE_BASELINE=1 to record one")
+    limit = baseline["relative"] * baseline.get("max_ratio", DEFAULT_MAX_RATIO) * TOLERANCE
+    assert relative <= limit, (
+        f"{name} cost {relative:.3f}x the reference workload ({microseconds:.1f}us per call), "
+        f"over the {limit:.3f}x limit (baseline {baseline['relative']:.3f}x)"
+    )
@@ -5,16 +5,53 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
-from flask import json
+from flask import Flask, json
 from destination_service import app as dest_app
 from user_service import app as user_app
 from authentication_service import app as auth_app
+from authentication_service.utils import TokenSigner
 from shared.config import Config
 import jwt
 import datetime
+import math
 from unittest.mock import patch, Mock
+import asyncio
+from aiohttp.test_utils import TestClient, TestServer
+import gateway
 import user_service.routes
+import user_service.models
+from user_service.models import UserIndex
 import destination_service.routes
+import destination_service.models
+import multiprocessing
+from destination_service.shared_catalog import SEQUENCE, CatalogReadTimeout, SharedCatalog
+from destination_service.models import DestinationStore
+from destination_service.events import Broadcaster, broadcaster
+from destination_service.pricing import quote, QuoteError
+from destination_service.projection import ADMIN, PUBLIC, ProjectionError, RenderCache, projection_for
+import destination_service.similarity
+from destination_service.similarity import SimilarityIndex
+from destination_service.availability import Availability, AvailabilityError, Unavailable
+from destination_service.pricing import PriceColumns
+from destination_service.batch import BatchError, apply_batch
+from destination_service.catalog_file import CatalogFileError, CatalogFileWatcher, load_catalog
+from destination_service.search import SearchError, SearchQuery, search
+from destination_service.shards import ShardedCatalog, ShardUnavailable, shard_for
+import requests
+import threading
+from urllib.parse import quote as url_quote
+from werkzeug.serving import make_server
+import time
+from shared import upstream
+from shared.singleflight import SingleFlight
+import io
+import logging
+import queue
+from shared import tracing
+from shared.health import Readiness, init_app as init_health
+from shared.capture import REDACTED, CaptureMiddleware, scrub, scrub_query
+from benchmarks import replay
+from shared.log import JsonFormatter, SamplingFilter, NonBlockingQueueHandler, request_id_var
 
 # Test clients for each service
 @pytest.fixture
@@ -37,6 +74,11 @@ def dest_client():
 def reset_current_token():
     user_service.routes.current_token = None
 
+# Start every test with closed circuit breakers
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    upstream.breakers.clear()
+
 # Test constants
 ADMIN_EMAIL = "masteradmin@example.com"
 ADMIN_PASSWORD = "Master@123"
@@ -53,6 +95,17 @@ def generate_token(email, role):
     }
     return jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
 
+# Helper: mocked responses for one destination service token validation
+def validation_responses(email, role):
+    mock_token_response = Mock()
+    mock_token_response.status_code = 200
+    mock_token_response.json.return_value = {'access_token': generate_token(email, role)}
+
+    mock_validate_response = Mock()
+    mock_validate_response.status_code = 200
+    mock_validate_response.json.return_value = {'email': email, 'role': role}
+    return [mock_token_response, mock_validate_response]
+
 # ==========================================
 # TESTS FOR AUTHENTICATION SERVICE
 # ==========================================
@@ -147,6 +200,25 @@ def test_profile_user(user_client):
     assert response.status_code == 200
     assert response.get_json()["email"] == USER_EMAIL
 
+@patch('shared.upstream.session.get')
+def test_destinations_use_forwarded_token(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User")[1:]
+    token = generate_token(USER_EMAIL, "User")
+    response = dest_client.get("/destinations", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs["headers"]["Authorization"] == f"Bearer {token}"
+
+@patch('shared.upstream.session.get')
+def test_profile_uses_forwarded_token(mock_get, user_client):
+    user_service.routes.current_token = generate_token(ADMIN_EMAIL, "Admin")
+    mock_get.return_value = Mock(status_code=200)
+    mock_get.return_value.json.return_value = {"email": USER_EMAIL, "role": "User"}
+    token = generate_token(USER_EMAIL, "User")
+    response = user_client.get("/profile", headers={"Authorization": f"Bearer {token}"})
+    assert response.get_json()["email"] == USER_EMAIL
+    assert mock_get.call_args.kwargs["headers"]["Authorization"] == f"Bearer {token}"
+
 def test_profile_without_token(user_client):
     response = user_client.get("/profile")
     assert response.status_code == 401
@@ -156,7 +228,7 @@ def test_profile_without_token(user_client):
 # TESTS FOR DESTINATION SERVICE
 # ==========================================
 
-@patch('destination_service.routes.requests.get')
+@patch('shared.upstream.session.get')
 def test_get_destinations_as_user(mock_get, dest_client, user_client):
     # Login as user and fetch token
     login_response = user_client.post(
@@ -183,7 +255,7 @@ def test_get_destinations_as_user(mock_get, dest_client, user_client):
     assert response.status_code == 200
     assert isinstance(response.get_json(), list)
 
-@patch('destination_service.routes.requests.get')
+@patch('shared.upstream.session.get')
 def test_get_destinations_without_token(mock_get, dest_client):
     # Simulate failure to fetch token from user service
     mock_token_response = Mock()
@@ -195,7 +267,7 @@ def test_get_destinations_without_token(mock_get, dest_client):
     assert response.status_code == 401
     assert "Token fetch failed" in response.get_json()["message"]
 
-@patch('destination_service.routes.requests.get')
+@patch('shared.upstream.session.get')
 def test_add_destination_as_admin(mock_get, dest_client, user_client):
     # Ensure master admin account exists
     user_client.post(
@@ -237,7 +309,7 @@ def test_add_destination_as_admin(mock_get, dest_client, user_client):
     assert response.status_code == 201
     assert response.get_json()["message"] == "Destination added successfully"
 
-@patch('destination_service.routes.requests.get')
+@patch('shared.upstream.session.get')
 def test_add_destination_as_user(mock_get, dest_client, user_client):
     # Login as user and fetch token
     login_response = user_client.post(
@@ -273,11 +345,25 @@ def test_add_destination_as_user(mock_get, dest_client, user_client):
     assert response.status_code == 403
     assert "Unauthorized action" in response.get_json()["message"]
 
+@patch('shared.upstream.session.get')
+def test_add_destination_validates_fields(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(ADMIN_EMAIL, "Admin") * 4
+    response = dest_client.post("/destinations", json=make_destination(7))
+    assert response.status_code == 400
+    assert 7 not in destination_service.models.store.snapshot().records
+    for destination in (
+        {**make_destination("BAD"), "description": None},
+        {**make_destination("BAD"), "price_per_night": "abc"},
+        [make_destination("BAD")],
+    ):
+        assert dest_client.post("/destinations", json=destination).status_code == 400
+    assert "BAD" not in destination_service.models.store.snapshot().records
+
 def test_generate_token_utility():
     token = generate_token(ADMIN_EMAIL, "Admin")
     assert isinstance(token, str)
 
-@patch('destination_service.routes.requests.get')
+@patch('shared.upstream.session.get')
 def test_delete_destination_as_admin(mock_get, dest_client, user_client):
     # Ensure master admin account exists and login
     user_client.post(
@@ -308,14 +394,11 @@ def test_delete_destination_as_admin(mock_get, dest_client, user_client):
     }
     mock_validate_response.text = "Success"
 
-    # Since multiple requests.get calls are made, we need to have enough responses
+    # Since multiple upstream GET calls are made, we need to have enough responses
+    # The Authorization header is used directly, so no token is fetched from the User Service
     mock_get.side_effect = [
-        # Adding destination
-        mock_token_response,      # Fetch token from User Service
-        mock_validate_response,   # Validate token with Auth Service
-        # Deleting destination
-        mock_token_response,      # Fetch token from User Service
-        mock_validate_response,   # Validate token with Auth Service
+        mock_validate_response,   # Adding destination: validate token with Auth Service
+        mock_validate_response,   # Deleting destination: validate token with Auth Service
     ]
 
     # Add a destination first, including the Authorization header
@@ -342,7 +425,7 @@ def test_delete_destination_as_admin(mock_get, dest_client, user_client):
     assert delete_response.get_json()["message"] == "Destination deleted successfully"
     
 
-@patch('destination_service.routes.requests.get')
+@patch('shared.upstream.session.get')
 def test_delete_destination_as_user(mock_get, dest_client, user_client):
     # Login as user and fetch token
     login_response = user_client.post(
@@ -374,6 +457,30 @@ def test_register_missing_fields(user_client):
     assert response.status_code == 400
     assert response.get_json()["message"] == "Missing required fields"
 
+def test_register_rejects_non_string_email(user_client):
+    response = user_client.post(
+        "/register",
+        json={"name": "List User", "email": ["list@example.com"], "password": "pw", "role": "User"},
+    )
+    assert response.status_code == 400
+    assert all(isinstance(email, str) for email in user_service.models.users)
+
+def test_add_user_keeps_table_and_index_in_step():
+    user = {"name": "Race", "email": "race@example.com", "password": "x", "role": "User"}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(user_service.models.add_user(dict(user)))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert sorted(results) == [False] * 7 + [True]
+        assert user_service.models.user_index.page(prefix="race@") == (["race@example.com"], None)
+    finally:
+        del user_service.models.users["race@example.com"]
+        user_service.models.user_index._emails.remove("race@example.com")
+        user_service.models.user_index._by_role["User"].remove("race@example.com")
+
 def test_register_admin_without_login(user_client):
     response = user_client.post(
         "/register",
@@ -381,3 +488,1450 @@ def test_register_admin_without_login(user_client):
     )
     assert response.status_code == 403
     assert response.get_json()["message"] == "Only admins can create admin accounts"
+
+
+# ==========================================
+# TESTS FOR INTER-SERVICE RESILIENCE
+# ==========================================
+
+@patch('shared.upstream.session.get')
+def test_upstream_retries_connection_errors(mock_get, dest_client):
+    mock_token_response = Mock()
+    mock_token_response.status_code = 200
+    mock_token_response.json.return_value = {'access_token': generate_token(USER_EMAIL, "User")}
+
+    mock_validate_response = Mock()
+    mock_validate_response.status_code = 200
+    mock_validate_response.json.return_value = {'email': USER_EMAIL, 'role': 'User'}
+
+    mock_get.side_effect = [requests.exceptions.ConnectionError("refused"), mock_token_response, mock_validate_response]
+
+    response = dest_client.get("/destinations")
+    assert response.status_code == 200
+    assert mock_get.call_count == 3
+    assert "timeout" in mock_get.call_args.kwargs
+
+def test_circuit_breaker_trips_and_short_circuits():
+    breaker = upstream.CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    assert breaker.allow()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == upstream.CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["short_circuited"] == 1
+
+def test_circuit_breaker_half_open_trial():
+    breaker = upstream.CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == upstream.CircuitBreaker.CLOSED
+
+@patch('shared.upstream.session.get')
+def test_open_breaker_skips_upstream(mock_get, dest_client):
+    upstream.get_breaker("user").record_failure()
+    upstream.get_breaker("user").state = upstream.CircuitBreaker.OPEN
+    upstream.get_breaker("user").opened_at = float("inf")
+
+    response = dest_client.get("/destinations")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(int(Config.BREAKER_RESET_TIMEOUT))
+    mock_get.assert_not_called()
+
+    response = dest_client.delete("/destinations/PAR")
+    assert response.status_code == 503
+
+def test_internal_upstreams_endpoint(dest_client):
+    assert dest_client.get("/_internal/upstreams").status_code == 403
+    upstream.get_breaker("auth")
+    response = dest_client.get("/_internal/upstreams", headers={"X-Internal-Request": "true"})
+    assert response.status_code == 200
+    assert response.get_json()["auth"]["state"] == "closed"
+
+# ==========================================
+# TESTS FOR SINGLE-FLIGHT TOKEN VALIDATION
+# ==========================================
+
+def test_singleflight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow_validate(token):
+        calls.append(token)
+        release.wait(timeout=2)
+        return {"token": token}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("tok", slow_validate, "tok")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["tok"]
+    assert results == [{"token": "tok"}] * 5
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 4}
+
+def test_singleflight_shares_errors_and_forgets_key():
+    flight = SingleFlight()
+
+    def failing():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        flight.do("tok", failing)
+    assert flight.do("tok", lambda: "ok") == "ok"
+
+# ==========================================
+# TESTS FOR API GATEWAY
+# ==========================================
+
+async def fake_warm_pool(session):
+    return {"auth": 4, "user": 4, "destination": 4}
+
+def run_gateway_request(path, fake_fetch, headers=None):
+    async def scenario():
+        with patch("gateway.fetch_json", side_effect=fake_fetch), \
+                patch("gateway.warm_pool", side_effect=fake_warm_pool):
+            async with TestClient(TestServer(gateway.create_app())) as client:
+                response = await client.get(path, headers=headers)
+                return response.status, await response.json()
+    return asyncio.run(scenario())
+
+def test_gateway_dashboard_fans_out_concurrently():
+    calls = []
+    in_flight = []
+
+    async def fake_fetch(session, name, url, headers=None):
+        calls.append(url)
+        if url.endswith("/validate"):
+            return 200, {"email": USER_EMAIL, "role": "User"}
+        in_flight.append(url)
+        await asyncio.sleep(0.05)
+        # Both backing calls must be in flight before either completes
+        assert len(in_flight) == 2
+        if url.endswith("/profile"):
+            return 200, {"name": "Test User", "email": USER_EMAIL, "role": "User"}
+        return 200, [{"name": "Paris"}]
+
+    status, body = run_gateway_request("/dashboard", fake_fetch, headers={"Authorization": "Bearer tok"})
+    assert status == 200
+    assert body["profile"]["email"] == USER_EMAIL
+    assert body["destinations"] == [{"name": "Paris"}]
+    assert sum(url.endswith("/validate") for url in calls) == 1
+
+def test_gateway_dashboard_rejects_invalid_token():
+    async def fake_fetch(session, name, url, headers=None):
+        if url.endswith("/validate"):
+            return 401, {"message": "Invalid token"}
+        raise AssertionError("backing services must not be called")
+
+    status, body = run_gateway_request("/dashboard", fake_fetch, headers={"Authorization": "Bearer bad"})
+    assert status == 401
+    assert body["message"] == "Invalid token"
+
+def test_gateway_handles_non_object_error_bodies():
+    async def fake_fetch(session, name, url, headers=None):
+        if url.endswith("/validate"):
+            return 200, {"email": USER_EMAIL, "role": "User"}
+        return 500, ["not", "an", "object"]
+
+    status, body = run_gateway_request("/dashboard", fake_fetch, headers={"Authorization": "Bearer tok"})
+    assert status == 500
+    assert body["message"] == "Upstream error"
+
+    async def fake_fetch(session, name, url, headers=None):
+        return 401, ["denied"]
+
+    status, body = run_gateway_request("/dashboard", fake_fetch, headers={"Authorization": "Bearer tok"})
+    assert (status, body["message"]) == (401, "Invalid token")
+
+class HangingSession:
+    def get(self, url, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        await asyncio.sleep(10)
+
+    async def __aexit__(self, *exc):
+        return False
+
+def test_gateway_keeps_a_trial_it_does_not_own():
+    breaker = upstream.CircuitBreaker("gateway-trial-owner", failure_threshold=1, reset_timeout=0)
+
+    async def scenario():
+        with patch("gateway.upstream.get_breaker", return_value=breaker):
+            # Closed breaker: this call is not a trial
+            task = asyncio.create_task(gateway.fetch_json(HangingSession(), "user", "http://user/healthz"))
+            await asyncio.sleep(0.01)
+            breaker.record_failure()
+            assert breaker.admit() is True
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(scenario())
+    # The trial taken after the cancelled call started is still in flight
+    assert not breaker.allow()
+
+def test_gateway_releases_half_open_trial_when_cancelled():
+    breaker = upstream.CircuitBreaker("gateway-trial", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def scenario():
+        with patch("gateway.upstream.get_breaker", return_value=breaker):
+            task = asyncio.create_task(gateway.fetch_json(HangingSession(), "user", "http://user/healthz"))
+            await asyncio.sleep(0.01)
+            assert not breaker.allow()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(scenario())
+    assert breaker.allow()
+
+# ==========================================
+# TESTS FOR SHARED-MEMORY CATALOG
+# ==========================================
+
+@pytest.fixture
+def shared_catalog():
+    catalog = SharedCatalog(size=64 * 1024, create=True, lock=multiprocessing.Lock())
+    yield catalog
+    destination_service.models.shared_catalog = None
+    catalog.close()
+    catalog.unlink()
+
+def _add_from_worker(name, lock):
+    catalog = SharedCatalog(name=name, lock=lock)
+    with catalog.writing() as records:
+        records["OSL"] = {"id": "OSL", "name": "Oslo", "description": "Fjords", "location": "Norway", "price_per_night": 190.0}
+    catalog.close()
+
+def test_shared_catalog_versions_and_projections(shared_catalog):
+    assert shared_catalog.version == 0
+    shared_catalog.publish({"PAR": {"id": "PAR", "name": "Paris"}})
+    assert shared_catalog.version == 1
+
+    reader = SharedCatalog(name=shared_catalog.name)
+    assert reader.read() == (1, b'[{"id": "PAR", "name": "Paris"}]')
+    assert reader.read(include_ids=False) == (1, b'[{"name": "Paris"}]')
+    reader.close()
+
+def test_shared_catalog_readers_give_up_on_a_dead_writer(shared_catalog):
+    shared_catalog.publish({"PAR": {"id": "PAR", "name": "Paris"}})
+    # A writer that died after bumping the sequence leaves it odd
+    sequence = SEQUENCE.unpack_from(shared_catalog._shm.buf, 0)[0]
+    SEQUENCE.pack_into(shared_catalog._shm.buf, 0, sequence + 1)
+    with patch("destination_service.shared_catalog.READ_TIMEOUT", 0.05):
+        started = time.monotonic()
+        with pytest.raises(CatalogReadTimeout):
+            shared_catalog.read()
+        with pytest.raises(CatalogReadTimeout):
+            shared_catalog.version
+        assert time.monotonic() - started < 1
+    SEQUENCE.pack_into(shared_catalog._shm.buf, 0, sequence)
+
+def test_shared_catalog_skips_unchanged_writes(shared_catalog):
+    shared_catalog.publish({})
+    with shared_catalog.writing() as records:
+        pass
+    assert shared_catalog.version == 1
+
+def test_shared_catalog_write_from_other_process(shared_catalog):
+    shared_catalog.publish({"PAR": {"id": "PAR", "name": "Paris"}})
+    worker = multiprocessing.get_context("fork").Process(
+        target=_add_from_worker, args=(shared_catalog.name, shared_catalog._lock)
+    )
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert set(shared_catalog.records()) == {"PAR", "OSL"}
+    assert shared_catalog.version == 2
+
+@patch('shared.upstream.session.get')
+def test_get_destinations_from_shared_catalog(mock_get, dest_client, shared_catalog):
+    destination_service.models.attach_shared_catalog(shared_catalog)
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User")
+
+    response = dest_client.get("/destinations")
+    assert response.status_code == 200
+    names = [dest["name"] for dest in response.get_json()]
+    assert names == [dest["name"] for dest in destination_service.models.store.snapshot().records.values()]
+    assert all("id" not in dest for dest in response.get_json())
+
+# ==========================================
+# TESTS FOR COPY-ON-WRITE DESTINATION STORE
+# ==========================================
+
+def test_store_snapshot_is_isolated_from_writes():
+    store = DestinationStore({"PAR": {"id": "PAR", "name": "Paris"}})
+    before = store.snapshot()
+    with store.update() as records:
+        records["OSL"] = {"id": "OSL", "name": "Oslo"}
+        del records["PAR"]
+
+    assert list(before.records) == ["PAR"]
+    assert before.version == 0
+    assert list(store.snapshot().records) == ["OSL"]
+    assert store.snapshot().version == 1
+    with pytest.raises(TypeError):
+        before.records["NYC"] = {}
+
+def test_store_unchanged_update_keeps_version():
+    store = DestinationStore({"PAR": {"id": "PAR"}})
+    with store.update():
+        pass
+    assert store.snapshot().version == 0
+
+def test_store_diffs_only_the_keys_writers_touched():
+    store = DestinationStore({"PAR": {"id": "PAR"}, "NYC": {"id": "NYC"}, "TOK": {"id": "TOK"}})
+    with store.update() as records:
+        records["PAR"] = {"id": "PAR"}
+    assert store.snapshot().version == 0
+
+    with store.update() as records:
+        records.pop("NYC")
+        records.update(OSL={"id": "OSL"})
+        records.setdefault("TOK", {})
+    assert store.snapshot().changes[-1] == (1, ("OSL",), ("NYC",))
+
+    with store.update() as records:
+        records.clear()
+    assert store.snapshot().changes[-1] == (2, (), ("PAR", "TOK", "OSL"))
+
+def test_store_listeners_run_in_order_outside_the_write_lock():
+    store = DestinationStore()
+    versions = []
+
+    def listener(previous, current, upserted, deleted):
+        # Another writer could take the lock while listeners run
+        assert store._write_lock.acquire(blocking=False)
+        store._write_lock.release()
+        versions.append(current.version)
+
+    store.add_listener(listener)
+
+    def writer(slot):
+        for i in range(50):
+            with store.update() as records:
+                records[f"W{slot}"] = {"id": f"W{slot}", "price_per_night": i}
+
+    threads = [threading.Thread(target=writer, args=(slot,)) for slot in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert versions == list(range(1, 201))
+
+def test_store_readers_see_consistent_snapshots_under_writes():
+    store = DestinationStore({f"D{i}": {"id": f"D{i}", "price_per_night": 0} for i in range(50)})
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        while not stop.is_set():
+            snapshot = store.snapshot()
+            prices = {dest["price_per_night"] for dest in snapshot.records.values()}
+            # Writers reprice the whole catalog in one version
+            if len(snapshot.records) != 50 or len(prices) != 1:
+                errors.append(snapshot.version)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for price in range(1, 200):
+        with store.update() as records:
+            for key in records:
+                records[key] = dict(records[key], price_per_night=price)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.snapshot().version == 199
+
+# ==========================================
+# TESTS FOR CATALOG DELTA SYNC
+# ==========================================
+
+def test_snapshot_delta_with_tombstones():
+    store = DestinationStore({"PAR": {"id": "PAR"}, "NYC": {"id": "NYC"}})
+    with store.update() as records:
+        records["OSL"] = {"id": "OSL"}
+    with store.update() as records:
+        del records["PAR"]
+        records["NYC"] = {"id": "NYC", "name": "New York"}
+
+    snapshot = store.snapshot()
+    assert snapshot.delta(2) == ([], [])
+    assert snapshot.delta(1) == ([{"id": "NYC", "name": "New York"}], ["PAR"])
+    assert snapshot.delta(0) == ([{"id": "OSL"}, {"id": "NYC", "name": "New York"}], ["PAR"])
+    assert snapshot.delta(3) is None
+
+def test_snapshot_delta_compacted_away():
+    store = DestinationStore({}, changelog_size=2)
+    for key in ("A", "B", "C"):
+        with store.update() as records:
+            records[key] = {"id": key}
+
+    snapshot = store.snapshot()
+    assert [version for version, _, _ in snapshot.changes] == [2, 3]
+    assert snapshot.delta(1) == ([{"id": "B"}, {"id": "C"}], [])
+    assert snapshot.delta(0) is None
+
+@patch('shared.upstream.session.get')
+def test_get_destinations_since_as_admin(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(ADMIN_EMAIL, "Admin") * 3
+    listing = dest_client.get("/destinations")
+    version = int(listing.headers["X-Catalog-Version"])
+
+    with destination_service.models.store.update() as records:
+        records["DELTA"] = {"id": "DELTA", "name": "Delta", "description": "d", "location": "l", "price_per_night": 1}
+
+    response = dest_client.get(f"/destinations?since={version}")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["version"] == version + 1
+    assert body["full"] is False
+    assert [dest["id"] for dest in body["upserted"]] == ["DELTA"]
+
+    with destination_service.models.store.update() as records:
+        del records["DELTA"]
+
+    body = dest_client.get(f"/destinations?since={version}").get_json()
+    assert body["upserted"] == []
+    assert body["deleted"] == ["DELTA"]
+
+@patch('shared.upstream.session.get')
+def test_get_destinations_since_full_snapshot(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User") * 2
+    current = destination_service.models.store.snapshot().version
+
+    body = dest_client.get(f"/destinations?since={current}").get_json()
+    assert body == {"version": current, "full": False, "upserted": [], "deleted": []}
+
+    body = dest_client.get(f"/destinations?since={current + 100}").get_json()
+    assert body["full"] is True
+    assert all("id" not in dest for dest in body["destinations"])
+
+@patch('shared.upstream.session.get')
+def test_get_destinations_since_invalid(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User") * 3
+    for since in ("abc", url_quote("²"), "-1"):
+        response = dest_client.get(f"/destinations?since={since}")
+        assert response.status_code == 400
+
+# ==========================================
+# TESTS FOR DESTINATION CHANGE STREAM
+# ==========================================
+
+def test_broadcaster_events_from_store_changes():
+    events = Broadcaster(buffer_size=10)
+    store = DestinationStore({"PAR": {"id": "PAR", "name": "Paris"}})
+    store.add_listener(events.on_catalog_change)
+    admin = events.subscribe(include_ids=True)
+    user = events.subscribe(include_ids=False)
+
+    with store.update() as records:
+        records["OSL"] = {"id": "OSL", "name": "Oslo"}
+        del records["PAR"]
+
+    stream = events.stream(user)
+    assert next(stream) == ": connected\n\n"
+    assert next(stream) == 'id: 1\nevent: add\ndata: {"type": "add", "version": 1, "destination": {"name": "Oslo"}}\n\n'
+    assert next(stream) == 'id: 1\nevent: delete\ndata: {"type": "delete", "version": 1}\n\n'
+    assert admin.queue.get_nowait()["destination"]["id"] == "OSL"
+    assert events.stats()["subscribers"] == 2
+    assert events.stats()["backlog"] == 1
+
+def test_broadcaster_disconnects_slow_subscriber():
+    events = Broadcaster(buffer_size=2)
+    slow = events.subscribe()
+    for version in range(1, 4):
+        events.publish({"type": "delete", "version": version, "id": "X"})
+
+    assert slow.closed
+    assert events.stats()["subscribers"] == 0
+    assert events.stats()["disconnected"] == 1
+    assert list(events.stream(slow)) == [": connected\n\n"]
+
+@patch('shared.upstream.session.get')
+def test_stream_destinations_endpoint(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(ADMIN_EMAIL, "Admin")
+    response = dest_client.get("/destinations/stream", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    chunks = response.response
+    assert next(chunks) == b": connected\n\n"
+    with destination_service.models.store.update() as records:
+        records["SSE"] = {"id": "SSE", "name": "Stream", "description": "d", "location": "l", "price_per_night": 1}
+    assert b'"id": "SSE"' in next(chunks)
+    assert broadcaster.stats()["subscribers"] == 1
+    response.close()
+    assert broadcaster.stats()["subscribers"] == 0
+
+    with destination_service.models.store.update() as records:
+        del records["SSE"]
+
+def test_internal_stream_stats_endpoint(dest_client):
+    assert dest_client.get("/_internal/stream_stats").status_code == 403
+    response = dest_client.get("/_internal/stream_stats", headers={"X-Internal-Request": "true"})
+    assert response.status_code == 200
+    assert "backlog" in response.get_json()
+
+# ==========================================
+# TESTS FOR BATCH TRIP QUOTES
+# ==========================================
+
+def test_quote_seasonal_and_length_of_stay_pricing():
+    store = DestinationStore({"A": {"id": "A", "price_per_night": 100.0}, "B": {"id": "B", "price_per_night": 50.0}})
+    totals, rates = quote(
+        store.snapshot(), ["A", "B", "A"], nights=[7, 2, 1],
+        check_in=["2026-06-28", "2026-01-10", "2026-03-01"],
+    )
+    # 3 June nights at 1.2 and 4 July nights at 1.25, then 10% off for a week
+    assert totals.tolist() == [774.0, 90.0, 100.0]
+    assert rates.tolist() == [0.1, 0.0, 0.0]
+
+def test_quote_flat_nights_and_check_out():
+    store = DestinationStore({"A": {"id": "A", "price_per_night": 100.0}})
+    totals, _ = quote(store.snapshot(), ["A"], nights=[2])
+    assert totals.tolist() == [200.0]
+    totals, _ = quote(store.snapshot(), ["A"], check_in=["2026-03-01"], check_out=["2026-03-04"])
+    assert totals.tolist() == [300.0]
+
+def test_quote_rejects_bad_input():
+    store = DestinationStore({"A": {"id": "A", "price_per_night": 100.0}})
+    with pytest.raises(QuoteError, match="Unknown destination IDs: ZZZ"):
+        quote(store.snapshot(), ["A", "ZZZ"], nights=[1, 1])
+    with pytest.raises(QuoteError):
+        quote(store.snapshot(), ["A"], nights=[0])
+    with pytest.raises(QuoteError):
+        quote(store.snapshot(), ["A"], nights=[1, 2])
+    with pytest.raises(QuoteError):
+        quote(store.snapshot(), ["A"], check_in=["not-a-date"], nights=[1])
+    with pytest.raises(QuoteError, match="whole numbers"):
+        quote(store.snapshot(), ["A"], nights=[1.9])
+    with pytest.raises(QuoteError, match="not both"):
+        quote(store.snapshot(), ["A"], nights=[1], check_in=["2026-03-01"], check_out=["2026-03-02"])
+    for ids in ([["A"], "A"], "A", None, [], [1]):
+        with pytest.raises(QuoteError, match="ids must be"):
+            quote(store.snapshot(), ids, nights=[1])
+
+def test_quote_columns_skip_non_string_ids():
+    store = DestinationStore({"A": {"id": "A", "price_per_night": 100.0}, 7: {"id": 7, "price_per_night": 10.0}})
+    assert quote(store.snapshot(), ["A"], nights=[1])[0].tolist() == [100.0]
+
+def test_quote_columns_are_per_snapshot():
+    first = DestinationStore({"A": {"id": "A", "price_per_night": 100.0}})
+    second = DestinationStore({"A": {"id": "A", "price_per_night": 50.0}, "B": {"id": "B", "price_per_night": "n/a"}})
+    assert quote(first.snapshot(), ["A"], nights=[1])[0].tolist() == [100.0]
+    assert quote(second.snapshot(), ["A"], nights=[1])[0].tolist() == [50.0]
+    with pytest.raises(QuoteError, match="without a valid price: B"):
+        quote(second.snapshot(), ["B"], nights=[1])
+
+def test_quote_columns_follow_catalog_version():
+    store = DestinationStore({"A": {"id": "A", "price_per_night": 100.0}})
+    assert quote(store.snapshot(), ["A"], nights=[1])[0].tolist() == [100.0]
+    with store.update() as records:
+        records["A"] = dict(records["A"], price_per_night=80.0)
+    assert quote(store.snapshot(), ["A"], nights=[1])[0].tolist() == [80.0]
+
+@patch('shared.upstream.session.get')
+def test_quote_endpoint(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User") * 2
+    response = dest_client.post("/destinations/quote", json={"ids": ["PAR", "TOK"], "nights": [2, 1]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["count"] == 2
+    assert body["totals"] == [400.0, 220.0]
+    assert body["grand_total"] == 620.0
+
+    response = dest_client.post("/destinations/quote", json={"ids": ["NOPE"], "nights": [1]})
+    assert response.status_code == 400
+
+# ==========================================
+# TESTS FOR ADMIN USER DIRECTORY
+# ==========================================
+
+def test_user_index_prefix_role_and_cursor():
+    index = UserIndex()
+    for email, role in [("carol@x.com", "User"), ("alice@x.com", "Admin"), ("bob@x.com", "User"),
+                        ("alan@y.com", "User"), ("dave@x.com", "User")]:
+        index.add(email, role)
+
+    assert index.page(prefix="al") == (["alan@y.com", "alice@x.com"], None)
+    assert index.page(role="User", limit=2) == (["alan@y.com", "bob@x.com"], "bob@x.com")
+    assert index.page(role="User", limit=2, after="bob@x.com") == (["carol@x.com", "dave@x.com"], None)
+    assert index.page(role="Guest") == ([], None)
+
+@patch('shared.upstream.session.get')
+def test_list_users_as_admin(mock_get, user_client):
+    for i in range(3):
+        user_client.post(
+            "/register",
+            json={"name": f"Directory {i}", "email": f"dir{i}@example.com", "password": "pw", "role": "User"},
+        )
+    user_service.routes.current_token = generate_token(ADMIN_EMAIL, "Admin")
+    mock_get.return_value = validation_responses(ADMIN_EMAIL, "Admin")[1]
+
+    response = user_client.get("/users?prefix=dir&limit=2")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [user["email"] for user in body["users"]] == ["dir0@example.com", "dir1@example.com"]
+    assert "password" not in body["users"][0]
+
+    response = user_client.get(f"/users?prefix=dir&limit=2&cursor={body['next_cursor']}")
+    body = response.get_json()
+    assert [user["email"] for user in body["users"]] == ["dir2@example.com"]
+    assert body["next_cursor"] is None
+
+    response = user_client.get("/users?role=Admin")
+    assert ADMIN_EMAIL in [user["email"] for user in response.get_json()["users"]]
+
+    assert user_client.get("/users?limit=0").status_code == 400
+
+@patch('shared.upstream.session.get')
+def test_list_users_requires_admin(mock_get, user_client):
+    assert user_client.get("/users").status_code == 401
+
+    user_service.routes.current_token = generate_token(USER_EMAIL, "User")
+    mock_get.return_value = validation_responses(USER_EMAIL, "User")[1]
+    assert user_client.get("/users").status_code == 403
+
+# ==========================================
+# TESTS FOR BATCH TOKEN ISSUANCE
+# ==========================================
+
+def test_token_signer_matches_pyjwt():
+    payload = {"email": USER_EMAIL, "role": "User", "exp": 2000000000}
+    signer = TokenSigner(Config.SECRET_KEY)
+    assert signer.sign(payload) == jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
+
+def admin_headers():
+    return {"Authorization": f"Bearer {generate_token(ADMIN_EMAIL, 'Admin')}"}
+
+def test_generate_tokens_batch(auth_client):
+    users = [{"email": f"load{i}@example.com", "role": "User"} for i in range(50)]
+    response = auth_client.post("/generate_tokens", json={"users": users}, headers=admin_headers())
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["count"] == 50
+    assert data["tokens_per_second"] > 0
+
+    decoded = jwt.decode(data["tokens"][7], Config.SECRET_KEY, algorithms=["HS256"])
+    assert decoded["email"] == "load7@example.com"
+    validate_response = auth_client.get("/validate", headers={"Authorization": f"Bearer {data['tokens'][0]}"})
+    assert validate_response.status_code == 200
+
+def test_generate_tokens_invalid_batch(auth_client):
+    assert auth_client.post("/generate_tokens", json={}, headers=admin_headers()).status_code == 400
+    response = auth_client.post("/generate_tokens", json={"users": [{"email": USER_EMAIL, "role": "User"}, {"email": ADMIN_EMAIL}]},
+                                headers=admin_headers())
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Email and role are required (item 1)"
+    with patch.object(Config, "TOKEN_BATCH_LIMIT", 1):
+        response = auth_client.post("/generate_tokens", json={"users": [{"email": "a", "role": "User"}] * 2},
+                                    headers=admin_headers())
+    assert response.status_code == 400
+
+def test_generate_tokens_requires_admin_and_allowed_roles(auth_client):
+    users = {"users": [{"email": USER_EMAIL, "role": "User"}]}
+    assert auth_client.post("/generate_tokens", json=users).status_code == 401
+    response = auth_client.post("/generate_tokens", json=users, headers={"Authorization": "Bearer forged"})
+    assert response.status_code == 401
+    user_token = generate_token(USER_EMAIL, "User")
+    response = auth_client.post("/generate_tokens", json=users, headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 403
+
+    response = auth_client.post("/generate_tokens", json={"users": [{"email": "x@example.com", "role": "Admin"}]},
+                                headers=admin_headers())
+    assert response.status_code == 400
+
+# ==========================================
+# TESTS FOR STRUCTURED LOGGING
+# ==========================================
+
+def make_record(msg, sample=False, **fields):
+    record = logging.LogRecord("test", logging.WARNING, __file__, 1, msg, (), None)
+    record.sample = sample
+    record.fields = fields
+    return record
+
+def test_json_formatter_includes_request_id_and_fields():
+    record = make_record("Token validation error", upstream="auth")
+    record.request_id = "abc123"
+    entry = json.loads(JsonFormatter("destination_service").format(record))
+    assert entry["message"] == "Token validation error"
+    assert entry["level"] == "WARNING"
+    assert entry["service"] == "destination_service"
+    assert entry["request_id"] == "abc123"
+    assert entry["upstream"] == "auth"
+
+def test_sampling_filter_limits_high_volume_messages():
+    sampler = SamplingFilter(burst=3, every=10)
+    kept = [record for record in (make_record("storm", sample=True) for _ in range(20)) if sampler.filter(record)]
+    # First three, then the 10th and 20th
+    assert len(kept) == 5
+    assert kept[3].suppressed == 6
+    assert all(sampler.filter(make_record("rare")) for _ in range(20))
+
+def test_queue_handler_never_blocks_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    started = time.perf_counter()
+    for _ in range(100):
+        handler.handle(make_record("burst"))
+    assert time.perf_counter() - started < 1
+    assert handler.dropped == 99
+
+@patch('shared.upstream.session.get')
+def test_request_id_is_echoed_and_propagated(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User")
+    response = dest_client.get("/destinations", headers={"X-Request-ID": "req-42"})
+    assert response.headers["X-Request-ID"] == "req-42"
+    assert mock_get.call_args.kwargs["headers"]["X-Request-ID"] == "req-42"
+    assert request_id_var.get() is None
+
+    response = dest_client.get("/")
+    assert len(response.headers["X-Request-ID"]) == 32
+
+# ==========================================
+# TESTS FOR REQUEST TRACING
+# ==========================================
+
+def test_nested_spans_share_trace():
+    tracing.collector.clear()
+    with tracing.span("outer") as outer:
+        with tracing.span("inner") as inner:
+            pass
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert [span.name for span in tracing.collector.spans(trace_id=outer.trace_id)] == ["inner", "outer"]
+    assert tracing.current_span.get() is None
+
+@patch('shared.upstream.session.get')
+def test_trace_context_propagates_to_upstreams(mock_get, dest_client):
+    tracing.collector.clear()
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User")
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = dest_client.get("/destinations", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    assert response.status_code == 200
+
+    spans = tracing.collector.spans(trace_id=trace_id)
+    server = [span for span in spans if span.name == "GET /destinations"][0]
+    assert server.parent_id == "00f067aa0ba902b7"
+    assert server.service == "destination_service"
+    assert server.attributes["status"] == 200
+
+    upstream_spans = [span for span in spans if span.name.startswith("upstream")]
+    assert [span.name for span in upstream_spans] == ["upstream user", "upstream auth"]
+    assert all(span.parent_id == server.span_id for span in upstream_spans)
+    sent = [call.kwargs["headers"]["traceparent"] for call in mock_get.call_args_list]
+    assert sent == [span.traceparent for span in upstream_spans]
+
+def test_password_hashing_is_traced(user_client):
+    tracing.collector.clear()
+    user_client.post(
+        "/register",
+        json={"name": "Traced User", "email": "traced@example.com", "password": "pw", "role": "User"},
+    )
+    hashing = tracing.collector.spans(name="generate_password_hash")
+    assert len(hashing) == 1
+    assert hashing[0].service == "user_service"
+    assert hashing[0].duration_ms > 0
+
+def test_file_exporter_writes_json_lines(tmp_path):
+    exporter = tracing.FileExporter(str(tmp_path / "spans.jsonl"))
+    exporter.export(tracing.Span("work", "test", "a" * 32))
+    exporter.close()
+    entry = json.loads((tmp_path / "spans.jsonl").read_text())
+    assert entry["name"] == "work"
+    assert entry["trace_id"] == "a" * 32
+
+# ==========================================
+# TESTS FOR HEALTH, READINESS AND WARM-UP
+# ==========================================
+
+def test_readiness_runs_warmers_and_reports_failures():
+    readiness = Readiness("test")
+    calls = []
+
+    @readiness.add_warmer
+    def warm_cache():
+        calls.append("cache")
+
+    failures = [ConnectionError("refused")]
+
+    @readiness.add_warmer
+    def warm_connection():
+        if failures:
+            raise failures.pop()
+
+    assert not readiness.ready
+    report = readiness.warm_up()
+    assert not readiness.ready
+    assert calls == ["cache"]
+    assert report["warm_cache"]["result"] == "ok"
+    assert report["warm_connection"]["result"] == "failed: refused"
+
+    # Only the failed warmer runs again, and the service is ready once it passes
+    readiness.warm_up()
+    assert readiness.ready
+    assert calls == ["cache"]
+
+def test_readiness_retries_failed_warmers_in_background():
+    readiness = Readiness("test")
+    attempts = []
+
+    @readiness.add_warmer
+    def warm_flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("refused")
+
+    readiness.warm_up_until_ready(interval=0.01)
+    assert readiness._ready.wait(timeout=2)
+    assert len(attempts) == 3
+
+def test_readiness_starts_warm_up_on_first_request():
+    app = Flask("standalone")
+    readiness = init_health(app, "standalone")
+    calls = []
+    readiness.add_warmer(lambda: calls.append(1))
+    client = app.test_client()
+
+    assert client.get("/healthz").status_code == 200
+    assert not readiness._started
+    client.get("/readyz")
+    assert readiness._ready.wait(timeout=2)
+    assert client.get("/readyz").status_code == 200
+    assert calls == [1]
+    readiness.start()
+    assert calls == [1]
+
+def test_service_health_and_readiness_endpoints(auth_client):
+    response = auth_client.get("/healthz")
+    assert response.status_code == 200
+    assert response.get_json()["service"] == "authentication_service"
+
+    auth_app.extensions["readiness"].warm_up()
+    response = auth_client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json()["warm_up"]["warm_token_signing"]["result"] == "ok"
+
+def test_destination_readiness_before_warm_up(dest_client):
+    readiness = dest_app.extensions["readiness"]
+    with patch.object(readiness, "_ready", threading.Event()):
+        response = dest_client.get("/readyz")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "warming_up"
+    assert "warm_catalog_caches" in [warmer.__name__ for warmer in readiness.warmers]
+
+def test_gateway_readiness_reports_warm_pool():
+    status, body = run_gateway_request("/readyz", fake_fetch=None)
+    assert status == 200
+    assert body["warm_up"]["connections"] == {"auth": 4, "user": 4, "destination": 4}
+
+# ==========================================
+# TESTS FOR CATALOG FILE HOT RELOAD
+# ==========================================
+
+CATALOG_CSV = (
+    "id,name,description,location,price_per_night\n"
+    "PAR,Paris,City of light,France,200\n"
+    "OSL,Oslo,Fjords,Norway,150.5\n"
+)
+
+def test_load_catalog_csv_and_json_lines(tmp_path):
+    csv_file = tmp_path / "catalog.csv"
+    csv_file.write_text(CATALOG_CSV)
+    jsonl_file = tmp_path / "catalog.jsonl"
+    jsonl_file.write_text(
+        '{"id": "PAR", "name": "Paris", "description": "City of light", "location": "France", "price_per_night": 200}\n'
+        '\n'
+        '{"id": "OSL", "name": "Oslo", "description": "Fjords", "location": "Norway", "price_per_night": 150.5}\n'
+    )
+
+    from_csv = load_catalog(str(csv_file))
+    assert from_csv == load_catalog(str(jsonl_file))
+    assert list(from_csv) == ["PAR", "OSL"]
+    assert from_csv["OSL"]["price_per_night"] == 150.5
+
+def test_load_catalog_rejects_invalid_files(tmp_path):
+    bad_price = tmp_path / "catalog.csv"
+    bad_price.write_text(CATALOG_CSV + "NYC,New York,Big apple,USA,cheap\n")
+    with pytest.raises(CatalogFileError):
+        load_catalog(str(bad_price))
+
+    missing_column = tmp_path / "short.csv"
+    missing_column.write_text("id,name\nPAR,Paris\n")
+    with pytest.raises(CatalogFileError):
+        load_catalog(str(missing_column))
+
+    with pytest.raises(CatalogFileError):
+        load_catalog(str(tmp_path / "catalog.xml"))
+
+    for price in ("nan", "inf", "-5"):
+        bad_price.write_text(CATALOG_CSV + f"NYC,New York,Big apple,USA,{price}\n")
+        with pytest.raises(CatalogFileError, match="Record 4: price_per_night"):
+            load_catalog(str(bad_price))
+
+    null_text = tmp_path / "catalog.jsonl"
+    null_text.write_text(json.dumps({**make_destination("NYC"), "description": None}) + "\n")
+    with pytest.raises(CatalogFileError, match="description must be a string"):
+        load_catalog(str(null_text))
+
+def test_catalog_watcher_applies_only_the_diff(tmp_path):
+    catalog_file = tmp_path / "catalog.csv"
+    catalog_file.write_text(CATALOG_CSV)
+    store = DestinationStore({"NYC": {"id": "NYC"}})
+
+    with patch.object(destination_service.models, "store", store):
+        watcher = CatalogFileWatcher(str(catalog_file))
+        assert watcher.check()
+        assert not watcher.check()
+        first = store.snapshot()
+        assert list(first.records) == ["PAR", "OSL"]
+        assert first.version == 1
+
+        catalog_file.write_text(CATALOG_CSV.replace("Oslo,Fjords,Norway,150.5", "Oslo,Fjords,Norway,175"))
+        os.utime(catalog_file, ns=(0, time.time_ns() + 10**9))
+        assert watcher.check()
+        second = store.snapshot()
+        assert second.version == 2
+        assert second.records["PAR"] is first.records["PAR"]
+        assert second.delta(1) == ([second.records["OSL"]], [])
+
+        # A broken file leaves the live catalog untouched
+        catalog_file.write_text("id,name\n")
+        os.utime(catalog_file, ns=(0, time.time_ns() + 2 * 10**9))
+        assert not watcher.check()
+        assert store.snapshot() is second
+
+        # ...including one the csv module rejects, and it isn't re-parsed until it changes
+        catalog_file.write_text(CATALOG_CSV + "NYC," + "x" * 200000 + ",Big apple,USA,250\n")
+        os.utime(catalog_file, ns=(0, time.time_ns() + 3 * 10**9))
+        with patch("destination_service.catalog_file.load_catalog", wraps=load_catalog) as load:
+            assert not watcher.check()
+            assert not watcher.check()
+            assert load.call_count == 1
+        assert store.snapshot() is second
+
+# ==========================================
+# TESTS FOR SPARSE FIELDSETS
+# ==========================================
+
+def make_destination(destination_id, price=100):
+    return {"id": destination_id, "name": destination_id, "description": "d", "location": "l", "price_per_night": price}
+
+def test_projection_for_normalizes_and_validates_fields():
+    assert projection_for(None, include_ids=True) is ADMIN
+    assert projection_for(None, include_ids=False) is PUBLIC
+    mobile = projection_for("price_per_night, name", include_ids=False)
+    assert mobile.fields == ("name", "price_per_night")
+    assert projection_for("name,price_per_night", include_ids=False) is mobile
+    assert projection_for("id,name", include_ids=False).fields == ("name",)
+    with pytest.raises(ProjectionError):
+        projection_for("name,secret", include_ids=True)
+    with pytest.raises(ProjectionError):
+        projection_for("id", include_ids=False)
+
+def test_render_cache_serializes_once_per_snapshot():
+    store = DestinationStore({"PAR": make_destination("PAR")})
+    cache = RenderCache()
+    mobile = projection_for("name,price_per_night", include_ids=False)
+    first = cache.render(store.snapshot(), mobile)
+    assert json.loads(first) == [{"name": "PAR", "price_per_night": 100}]
+    assert cache.render(store.snapshot(), mobile) is first
+
+    with store.update() as records:
+        records["OSL"] = make_destination("OSL")
+    assert len(json.loads(cache.render(store.snapshot(), mobile))) == 2
+    assert cache.stats() == {"version": 1, "projections": [["name", "price_per_night"]]}
+
+@patch('shared.upstream.session.get')
+def test_get_destinations_with_fields(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User") * 2
+    response = dest_client.get("/destinations?fields=name,price_per_night,id")
+    assert response.status_code == 200
+    assert "X-Catalog-Version" in response.headers
+    destinations = response.get_json()
+    assert destinations
+    assert all(set(dest) == {"name", "price_per_night"} for dest in destinations)
+
+    response = dest_client.get("/destinations?fields=bogus")
+    assert response.status_code == 400
+
+# ==========================================
+# TESTS FOR BATCH DESTINATION WRITES
+# ==========================================
+
+def test_apply_batch_in_order():
+    records = {"PAR": make_destination("PAR"), "TOK": make_destination("TOK")}
+    applied = apply_batch(records, [
+        {"op": "create", "destination": make_destination("OSL", 150)},
+        {"op": "update", "id": "OSL", "changes": {"price_per_night": 175}},
+        {"op": "delete", "id": "TOK"},
+    ])
+    assert applied == {"create": 1, "update": 1, "delete": 1}
+    assert sorted(records) == ["OSL", "PAR"]
+    assert records["OSL"]["price_per_night"] == 175
+
+def test_apply_batch_rejects_invalid_operations():
+    records = {"PAR": make_destination("PAR")}
+    for operations, index in [
+        ([{"op": "delete", "id": "PAR"}, {"op": "delete", "id": "PAR"}], 1),
+        ([{"op": "create", "destination": make_destination("PAR")}], 0),
+        ([{"op": "update", "id": "PAR", "changes": {"id": "NEW"}}], 0),
+        ([{"op": "update", "id": "PAR", "changes": {"price_per_night": "free"}}], 0),
+        ([{"op": "rename", "id": "PAR"}], 0),
+        ([{"op": "delete", "id": "PAR"}, {"op": "delete", "id": ["PAR"]}], 1),
+        ([{"op": "update", "id": {"PAR": 1}, "changes": {"name": "x"}}], 0),
+        ([{"op": "create", "destination": make_destination(["NEW"])}], 0),
+        ([{"op": "create", "destination": {**make_destination("NEW"), "description": None}}], 0),
+        ([{"op": "update", "id": "PAR", "changes": {"name": 5}}], 0),
+        ([{"op": "update", "id": "PAR", "changes": {"price_per_night": float("nan")}}], 0),
+    ]:
+        with pytest.raises(BatchError) as excinfo:
+            apply_batch(dict(records), operations)
+        assert excinfo.value.index == index
+    with pytest.raises(BatchError):
+        apply_batch(records, [])
+
+@patch('shared.upstream.session.get')
+def test_batch_destinations_publishes_one_version(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(ADMIN_EMAIL, "Admin") * 2
+    before = destination_service.models.store.snapshot()
+    response = dest_client.post("/destinations/batch", json={"operations": [
+        {"op": "create", "destination": make_destination("BAT1")},
+        {"op": "create", "destination": make_destination("BAT2")},
+        {"op": "update", "id": "BAT1", "changes": {"name": "Batch one"}},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["version"] == before.version + 1
+    assert body["applied"] == {"create": 2, "update": 1, "delete": 0}
+    # Each thread sees the version its own write produced, whatever other writers do later
+    def other_writer():
+        with destination_service.models.store.update() as records:
+            records["BAT3"] = make_destination("BAT3")
+    writer = threading.Thread(target=other_writer)
+    writer.start()
+    writer.join()
+    assert destination_service.models.store.snapshot().version == before.version + 2
+    assert destination_service.models.written_version() == before.version + 1
+    after = destination_service.models.store.snapshot()
+    assert after.records["BAT1"]["name"] == "Batch one"
+
+    # A failing operation rolls back the whole batch
+    response = dest_client.post("/destinations/batch", json={"operations": [
+        {"op": "delete", "id": "BAT1"},
+        {"op": "delete", "id": "MISSING"},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()["index"] == 1
+    assert destination_service.models.store.snapshot() is after
+
+    with destination_service.models.store.update() as records:
+        del records["BAT1"], records["BAT2"], records["BAT3"]
+
+@patch('shared.upstream.session.get')
+def test_batch_destinations_requires_admin(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User")
+    response = dest_client.post("/destinations/batch", json={"operations": [{"op": "delete", "id": "PAR"}]})
+    assert response.status_code == 403
+
+# ==========================================
+# TESTS FOR SIMILAR DESTINATIONS
+# ==========================================
+
+def similarity_catalog():
+    return {
+        "NIC": {"id": "NIC", "name": "Nice", "description": "Sunny beach town by the sea", "location": "France", "price_per_night": 180},
+        "CAN": {"id": "CAN", "name": "Cannes", "description": "Glamorous beach town by the sea", "location": "France", "price_per_night": 220},
+        "ZER": {"id": "ZER", "name": "Zermatt", "description": "Ski resort below the Matterhorn", "location": "Switzerland", "price_per_night": 300},
+        "CHX": {"id": "CHX", "name": "Chamonix", "description": "Ski resort below Mont Blanc", "location": "France", "price_per_night": 260},
+    }
+
+def test_similarity_index_ranks_by_text_and_price():
+    store = DestinationStore(similarity_catalog())
+    index = SimilarityIndex(dimensions=256)
+    index.sync(store.snapshot())
+
+    assert [key for key, _ in index.similar("NIC", 2)] == ["CAN", "CHX"]
+    assert index.similar("ZER", 1)[0][0] == "CHX"
+    assert index.similar("NIC", 3) == index._neighbors["NIC"]
+    with pytest.raises(KeyError):
+        index.similar("XXX")
+
+def test_similarity_index_applies_catalog_changes_incrementally():
+    store = DestinationStore(similarity_catalog())
+    index = SimilarityIndex(dimensions=256)
+    index.sync(store.snapshot())
+    rows = dict(index._rows)
+
+    with store.update() as records:
+        del records["CAN"]
+        records["ANT"] = {"id": "ANT", "name": "Antibes", "description": "Quiet beach town by the sea", "location": "France", "price_per_night": 190}
+    index.sync(store.snapshot())
+
+    assert index.version == 1
+    assert index._rows["ANT"] == rows["CAN"]
+    assert index._rows["NIC"] == rows["NIC"]
+    assert index.similar("NIC", 1)[0][0] == "ANT"
+
+def test_similarity_index_tolerates_bad_prices_and_text():
+    catalog = similarity_catalog()
+    catalog["BAD"] = {**catalog["NIC"], "id": "BAD", "description": None, "price_per_night": "abc"}
+    catalog["NAN"] = {**catalog["CAN"], "id": "NAN", "price_per_night": float("nan")}
+    index = SimilarityIndex(dimensions=256)
+    index.sync(DestinationStore(catalog).snapshot())
+    assert index.similar("NIC", 1)[0][0] in ("CAN", "NAN")
+    assert all(math.isfinite(score) for _, score in index.similar("BAD"))
+
+@patch('shared.upstream.session.get')
+def test_similar_destinations_endpoint(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User") * 4
+    with patch.object(destination_service.models, "store", DestinationStore(similarity_catalog())), \
+            patch.object(destination_service.similarity, "index", SimilarityIndex(dimensions=256)):
+        response = dest_client.get("/destinations/NIC/similar?k=2")
+        assert response.status_code == 200
+        similar = response.get_json()["similar"]
+        assert [dest["name"] for dest in similar] == ["Cannes", "Chamonix"]
+        assert all("id" not in dest and 0 < dest["score"] <= 1 for dest in similar)
+
+        assert dest_client.get("/destinations/XXX/similar").status_code == 404
+        assert dest_client.get("/destinations/NIC/similar?k=0").status_code == 400
+        assert dest_client.get(f"/destinations/NIC/similar?k={url_quote('²')}").status_code == 400
+
+# ==========================================
+# TESTS FOR AVAILABILITY AND BOOKINGS
+# ==========================================
+
+def stay_date(index, days):
+    return str(index.start + datetime.timedelta(days=days))
+
+def test_availability_books_ranges_atomically():
+    index = Availability(days=60, today=lambda: datetime.date(2030, 1, 1))
+    assert index.book("PAR", "2030-01-10", "2030-01-13") == 3
+    with pytest.raises(Unavailable):
+        index.book("PAR", "2030-01-05", "2030-01-11")
+    assert index.booked_nights("PAR") == ["2030-01-10", "2030-01-11", "2030-01-12"]
+    # Check-out day is free for the next guest
+    assert index.book("PAR", "2030-01-13", "2030-01-15") == 2
+
+    for check_in, check_out in [("2030-01-15", "2030-01-15"), ("2029-12-31", "2030-01-02"),
+                                ("2030-02-25", "2030-03-05"), ("soon", "2030-01-02")]:
+        with pytest.raises(AvailabilityError):
+            index.book("PAR", check_in, check_out)
+
+def test_availability_search_with_price_cap():
+    store = DestinationStore({key: make_destination(key, price) for key, price in
+                              [("PAR", 200), ("NYC", 250), ("TOK", 150), ("OSL", 120)]})
+    columns = PriceColumns(store.snapshot())
+    index = Availability(days=60, today=lambda: datetime.date(2030, 1, 1))
+    index.book("TOK", "2030-01-12", "2030-01-13")
+
+    found = columns.ids[index.search(columns, "2030-01-10", "2030-01-15")].tolist()
+    assert found == ["OSL", "PAR", "NYC"]
+    found = columns.ids[index.search(columns, "2030-01-10", "2030-01-15", max_price=200)].tolist()
+    assert found == ["OSL", "PAR"]
+    found = columns.ids[index.search(columns, "2030-01-13", "2030-01-20", max_price=200)].tolist()
+    assert found == ["OSL", "TOK", "PAR"]
+
+def test_availability_window_rolls_forward_with_the_date():
+    today = [datetime.date(2030, 1, 1)]
+    index = Availability(days=30, today=lambda: today[0])
+    index.book("PAR", "2030-01-10", "2030-01-12")
+    index.book("PAR", "2030-01-25", "2030-01-27")
+
+    today[0] = datetime.date(2030, 1, 20)
+    with pytest.raises(AvailabilityError):
+        index.book("PAR", "2030-01-15", "2030-01-16")
+    assert index.booked_nights("PAR") == ["2030-01-25", "2030-01-26"]
+    with pytest.raises(Unavailable):
+        index.book("PAR", "2030-01-26", "2030-01-28")
+    # The window still reaches `days` nights ahead of the new date
+    assert index.book("PAR", "2030-02-17", "2030-02-19") == 2
+    assert index._bits.shape[1] == 5
+
+def test_availability_forgets_deleted_destinations():
+    index = Availability(days=30, today=lambda: datetime.date(2030, 1, 1))
+    index.book("PAR", "2030-01-02", "2030-01-04")
+    row = index._rows["PAR"]
+    index.on_catalog_change(None, None, (), ("PAR",))
+    assert "PAR" not in index._rows
+    assert index.booked_nights("PAR") == []
+    index.book("OSL", "2030-01-02", "2030-01-04")
+    assert index._rows["OSL"] == row
+
+@patch('shared.upstream.session.get')
+def test_book_and_search_endpoints(mock_get, dest_client):
+    mock_get.side_effect = validation_responses(USER_EMAIL, "User") * 6
+    index = Availability(days=30)
+    check_in, check_out = stay_date(index, 3), stay_date(index, 8)
+    with patch.object(destination_service.routes, "availability", index):
+        response = dest_client.post("/destinations/PAR/bookings", json={"check_in": check_in, "check_out": check_out})
+        assert response.status_code == 201
+        assert response.get_json()["nights"] == 5
+
+        response = dest_client.post("/destinations/PAR/bookings", json={"check_in": check_in, "check_out": check_out})
+        assert response.status_code == 409
+        response = dest_client.post("/destinations/XXX/bookings", json={"check_in": check_in, "check_out": check_out})
+        assert response.status_code == 404
+        response = dest_client.post("/destinations/PAR/bookings", json=[check_in, check_out])
+        assert response.status_code == 400
+
+        response = dest_client.get(f"/destinations/available?check_in={check_in}&check_out={check_out}&max_price=250")
+        assert response.status_code == 200
+        body = response.get_json()
+        names = [dest["name"] for dest in body["destinations"]]
+        assert "Paris" not in names and body["count"] == len(names)
+        assert all("id" not in dest and dest["price_per_night"] <= 250 for dest in body["destinations"])
+
+        response = dest_client.get(f"/destinations/available?check_in={check_out}&check_out={check_in}")
+        assert response.status_code == 400
+
+# ==========================================
+# TESTS FOR UNIX DOMAIN SOCKET TRANSPORT
+# ==========================================
+
+def test_upstream_call_over_unix_socket(tmp_path):
+    socket_path = str(tmp_path / "auth.sock")
+    server = make_server(f"unix://{socket_path}", 0, auth_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http+unix://{url_quote(socket_path, safe='')}"
+        token = generate_token(USER_EMAIL, "User")
+        for _ in range(2):
+            response = upstream.call("auth", "get", f"{url}/validate", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+            assert response.json()["email"] == USER_EMAIL
+    finally:
+        server.shutdown()
+        upstream.session.get_adapter(url).close()
+
+def test_gateway_splits_unix_socket_urls():
+    assert gateway.split_service_url("http+unix://%2Ftmp%2Fsvc%2Fauth.sock") == ("/tmp/svc/auth.sock", "http://localhost")
+    assert gateway.split_service_url("http://localhost:5001") == (None, "http://localhost:5001")
+
+# ==========================================
+# TESTS FOR TRAFFIC CAPTURE AND REPLAY
+# ==========================================
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+def test_scrub_removes_secrets():
+    assert scrub({"email": "a@b.c", "password": "pw", "users": [{"token": "t", "role": "User"}]}) == {
+        "email": "a@b.c", "password": REDACTED, "users": [{"token": REDACTED, "role": "User"}],
+    }
+    assert scrub_query("token=abc&limit=5") == "token=%3Credacted%3E&limit=5"
+
+def test_capture_middleware_records_scrubbed_requests():
+    writer = ListWriter()
+    with patch.object(user_app, "wsgi_app", CaptureMiddleware(user_app, "user_service", writer)):
+        client = user_app.test_client()
+        response = client.post("/login", json={"email": ADMIN_EMAIL, "password": "wrong"},
+                               headers={"Authorization": "Bearer secret-token"})
+        assert response.status_code == 401
+        client.get("/healthz")
+
+    [record] = writer.records
+    assert record["service"] == "user_service"
+    assert record["endpoint"] == "login"
+    assert (record["method"], record["path"], record["status"]) == ("POST", "/login", 401)
+    assert record["json"] == {"email": ADMIN_EMAIL, "password": REDACTED}
+    assert record["headers"]["Authorization"] == REDACTED
+    assert "secret-token" not in json.dumps(record) and "wrong" not in json.dumps(record)
+
+def test_capture_middleware_keeps_unparsed_bodies_off_disk():
+    writer = ListWriter()
+    seen = []
+
+    def app(environ, start_response):
+        seen.append(environ["wsgi.input"].read())
+        start_response("400 Bad Request", [])
+        return [b""]
+
+    flask_app = Mock(wsgi_app=app, url_map=user_app.url_map)
+    middleware = CaptureMiddleware(flask_app, "user_service", writer)
+    body = b'{"email": "a@b.c", "password": "hunter2"'
+    for length, expected in ((str(len(body)), body), ("nonsense", b"chunked body")):
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/login", "CONTENT_LENGTH": length,
+                   "wsgi.input": io.BytesIO(expected)}
+        middleware(environ, lambda status, headers, exc_info=None: None)
+
+    assert seen == [body, b"chunked body"]
+    first, second = writer.records
+    assert first["unparsed"] and first["body_length"] == len(body)
+    assert "hunter2" not in json.dumps(first)
+    assert second["status"] == 400 and "unparsed" not in second
+
+def test_replay_restores_credentials(tmp_path):
+    capture = tmp_path / "capture.jsonl"
+    records = [
+        {"ts": 2.0, "service": "user_service", "endpoint": "login", "method": "POST", "path": "/login", "query": "",
+         "headers": {"Content-Type": "application/json"}, "status": 200, "json": {"email": ADMIN_EMAIL, "password": REDACTED}},
+        {"ts": 1.0, "service": "destination_service", "endpoint": "get_destinations", "method": "GET", "path": "/destinations",
+         "query": "fields=name", "headers": {"Authorization": REDACTED}, "status": 200},
+        {"ts": 1.5, "service": "authentication_service", "endpoint": "validate", "method": "GET", "path": "/validate",
+         "query": "", "headers": {"Authorization": REDACTED, "X-Caller-Service": "destination_service"}, "status": 200},
+    ]
+    capture.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    loaded = replay.load_capture(str(capture))
+    assert [record["path"] for record in loaded] == ["/destinations", "/login"]
+    assert len(replay.load_capture(str(capture), include_internal=True)) == 3
+
+    method, url, kwargs = replay.prepare(loaded[0], "fresh-token", "pw")
+    assert (method, url) == ("GET", f"{Config.DESTINATION_SERVICE_URL}/destinations?fields=name")
+    assert kwargs["headers"]["Authorization"] == "Bearer fresh-token"
+    _, _, kwargs = replay.prepare(loaded[1], "fresh-token", "pw")
+    assert json.loads(kwargs["data"]) == {"email": ADMIN_EMAIL, "password": "pw"}
+
+# ==========================================
+# TESTS FOR SHARDED CATALOG
+# ==========================================
+
+@pytest.fixture
+def sharded_catalog():
+    catalog = ShardedCatalog(3, destination_service.models.sample_destinations)
+    yield catalog
+    catalog.close()
+
+def test_search_query_filters_sorts_and_pages():
+    snapshot = DestinationStore(destination_service.models.sample_destinations).snapshot()
+
+    total, page = search(snapshot, SearchQuery(text="CITY", sort="-price_per_night", limit=2))
+    assert total == 4
+    assert [record["id"] for record in page] == ["NYC", "TOK"]
+    _, page = search(snapshot, SearchQuery(text="city", sort="-price_per_night", offset=2, limit=2))
+    assert [record["id"] for record in page] == ["ROM", "PAR"]
+
+    total, page = search(snapshot, SearchQuery(location="france", min_price=150, max_price=200))
+    assert (total, [record["id"] for record in page]) == (1, ["PAR"])
+
+    with pytest.raises(SearchError):
+        SearchQuery(sort="description")
+    with pytest.raises(SearchError):
+        SearchQuery.from_args({"limit": "0"})
+    with pytest.raises(SearchError):
+        SearchQuery.from_args({"max_price": "cheap"})
+
+def test_search_skips_mistyped_fields():
+    records = {
+        "PAR": make_destination("PAR", price=200),
+        "BAD": {**make_destination("BAD", price="abc"), "description": None, "location": None},
+        "OSL": make_destination("OSL", price=150),
+    }
+    snapshot = DestinationStore(records).snapshot()
+    total, page = search(snapshot, SearchQuery(text="bad", sort="price_per_night"))
+    assert (total, [record["id"] for record in page]) == (1, ["BAD"])
+    _, page = search(snapshot, SearchQuery(sort="price_per_night"))
+    assert [record["id"] for record in page] == ["OSL", "PAR", "BAD"]
+    total, _ = search(snapshot, SearchQuery(location="l", max_price=500))
+    assert total == 2
+
+def test_sharded_catalog_matches_a_single_catalog(sharded_catalog):
+    records = {
+        f"D{number:03}": make_destination(f"D{number:03}", price=100 + number % 17)
+        for number in range(120)
+    }
+    assert sharded_catalog.replace(records) == (120, 0, 6)
+    assert sorted({shard_for(key, 3) for key in records}) == [0, 1, 2]
+    snapshot = DestinationStore(records).snapshot()
+
+    for sort in ("id", "-price_per_night", "name"):
+        for offset in (0, 25, 110):
+            query = SearchQuery(sort=sort, offset=offset, limit=25, min_price=105)
+            assert sharded_catalog.search(query) == search(snapshot, query)
+
+    version, listing = sharded_catalog.records()
+    assert [record["id"] for record in listing] == sorted(records)
+    assert sharded_catalog.size() == 120
+
+    assert sharded_catalog.get("D007") == records["D007"]
+    assert not sharded_catalog.add(records["D007"])
+    assert sharded_catalog.add(make_destination("NEW"))
+    assert sharded_catalog.delete("D007")
+    assert not sharded_catalog.delete("D007")
+    assert sharded_catalog.get("D007") is None
+    assert sharded_catalog.version() == version + 2
+
+def test_sharded_catalog_hashes_non_string_ids(sharded_catalog):
+    assert shard_for(7, 3) == shard_for("7", 3)
+    assert sharded_catalog.add(make_destination(7))
+    assert sharded_catalog.get(7)["id"] == 7
+
+@patch('shared.upstream.session.get')
+def test_dead_shard_answers_503(mock_get, dest_client, sharded_catalog):
+    mock_get.side_effect = validation_responses(ADMIN_EMAIL, "Admin") * 2
+    shard = shard_for("PAR", 3)
+    sharded_catalog._processes[shard].kill()
+    sharded_catalog._processes[shard].join()
+    with patch.object(destination_service.models, "sharded_catalog", sharded_catalog):
+        assert dest_client.get("/destinations/PAR").status_code == 503
+        assert dest_client.get("/destinations").status_code == 503
+    assert sharded_catalog.down() == [shard]
+    with pytest.raises(ShardUnavailable):
+        sharded_catalog.size()
+
+def test_process_local_endpoints_refuse_per_request_processes(dest_client):
+    headers = {"X-Internal-Request": "true"}
+    with patch.object(destination_service.models, "shared_catalog", object()):
+        assert dest_client.get("/_internal/upstreams", headers=headers).status_code == 501
+        # Bookings would be lost with the process that took them, so nights could be sold twice
+        stay = {"check_in": "2030-01-01", "check_out": "2030-01-02"}
+        assert dest_client.post("/destinations/PAR/bookings", json=stay).status_code == 501
+        assert dest_client.get("/destinations/available", query_string=stay).status_code == 501
+        # Change events never reach a forked request process, so a stream would stay silent
+        assert dest_client.get("/destinations/stream").status_code == 501
+        assert dest_client.get("/_internal/stream_stats", headers=headers).status_code == 501
+    assert dest_client.get("/_internal/upstreams", headers=headers).status_code == 200
+    assert "GET /_internal/upstreams" in destination_service.routes.persistent_process_only_endpoints()
+
+def test_local_catalog_only_endpoints_are_listed():
+    endpoints = destination_service.routes.local_catalog_only_endpoints()
+    assert "POST /destinations/quote" in endpoints
+    assert "GET /destinations/available" in endpoints
+    assert "GET /destinations?since=" in endpoints
+
+@patch('shared.upstream.session.get')
+def test_destination_endpoints_on_sharded_catalog(mock_get, dest_client, sharded_catalog):
+    mock_get.side_effect = validation_responses(ADMIN_EMAIL, "Admin") * 6 + validation_responses(USER_EMAIL, "User") * 2
+    with patch.object(destination_service.models, "sharded_catalog", sharded_catalog):
+        response = dest_client.post("/destinations", json=make_destination("OSL", price=150))
+        assert response.status_code == 201
+        assert dest_client.post("/destinations", json=make_destination("OSL")).status_code == 400
+        assert dest_client.delete("/destinations/PAR").status_code == 200
+        assert dest_client.get("/destinations/PAR").status_code == 404
+        assert dest_client.get("/destinations/OSL").get_json()["price_per_night"] == 150
+
+        response = dest_client.get("/destinations")
+        assert [dest["id"] for dest in response.get_json()] == ["NYC", "OSL", "RIO", "ROM", "SYD", "TOK"]
+        assert response.headers["X-Catalog-Version"] == "2"
+
+        assert dest_client.post("/destinations/quote", json={"ids": ["NYC"]}).status_code == 501
+
+        response = dest_client.get("/destinations/search?sort=price_per_night&limit=2&offset=1")
+        body = response.get_json()
+        assert body["count"] == 6
+        assert [dest["name"] for dest in body["destinations"]] == ["Rio de Janeiro", "Sydney"]
+        assert all("id" not in dest for dest in body["destinations"])
+        assert dest_client.get("/destinations/search?sort=rating").status_code == 400
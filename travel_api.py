@@ -1,35 +1,157 @@
+import atexit
+import multiprocessing
+import os
 import threading
 import logging
 import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+import requests
+from shared import upstream
+from shared.config import Config
+from shared.log import setup_logging
 from destination_service import app as destination_app
+from destination_service.catalog_file import CatalogFileWatcher
+from destination_service.routes import local_catalog_only_endpoints, persistent_process_only_endpoints
+from destination_service.models import attach_shared_catalog, attach_sharded_catalog, store
+from destination_service.shared_catalog import SharedCatalog
+from destination_service.shards import ShardedCatalog
 from user_service import app as user_app
 from authentication_service import app as auth_app
 
-logging.basicConfig(level=logging.INFO)
+setup_logging("travel_api")
 
-def is_port_in_use(port):
+def is_port_in_use(host, port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
+        return s.connect_ex((host, port)) == 0
 
-def run_app(app, port):
-    if is_port_in_use(port):
-        logging.error(f"Port {port} is already in use.")
+def is_socket_in_use(path):
+    """
+    Whether a server is listening on the Unix socket. A stale socket file left by
+    a previous run is removed so the path can be bound again.
+    """
+    if not os.path.exists(path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        if s.connect_ex(path) == 0:
+            return True
+    os.unlink(path)
+    return False
+
+def bind_address(url):
+    """
+    The (host, port) to serve a service URL on; Unix socket URLs become werkzeug's unix:// host.
+    """
+    if url.startswith("http+unix://"):
+        return "unix://" + unquote(urlparse(url).netloc), 0
+    parsed = urlparse(url)
+    return parsed.hostname, parsed.port
+
+def run_app(app, url, options=None):
+    host, port = bind_address(url)
+    if host.startswith("unix://"):
+        if is_socket_in_use(host[len("unix://"):]):
+            logging.error(f"Socket {host} is already in use.")
+            return
+    elif is_port_in_use(host, port):
+        logging.error(f"Port {port} on {host} is already in use.")
         return
     try:
-        logging.info(f"Starting app on port {port}")
-        app.run(host='localhost', port=port)
+        logging.info(f"Starting app on {url}")
+        app.run(host=host, port=port, **(options or {}))
     except Exception as e:
-        logging.error(f"Error running app on port {port}: {e}")
+        logging.error(f"Error running app on {url}: {e}")
 
-if __name__ == '__main__':
+def share_destination_catalog():
+    """
+    Let the destination service's per-request processes serve one catalog from shared memory.
+    """
+    catalog = SharedCatalog(size=Config.SHARED_CATALOG_SIZE, create=True, lock=multiprocessing.Lock())
+    attach_shared_catalog(catalog)
+    atexit.register(catalog.unlink)
+    logging.warning(
+        f"DESTINATION_PROCESSES={Config.DESTINATION_PROCESSES}: every destination request runs in its own "
+        "forked process, so circuit breakers, token single-flight and the render, price, search and similarity "
+        "caches start over for each request. These endpoints answer 501: "
+        + ", ".join(persistent_process_only_endpoints())
+    )
+
+def shard_destination_catalog():
+    """
+    Partition the destination catalog across shard worker processes, forked before
+    the servers start.
+    """
+    catalog = ShardedCatalog(Config.DESTINATION_SHARDS, store.snapshot().records)
+    attach_sharded_catalog(catalog)
+    logging.warning(
+        f"DESTINATION_SHARDS={Config.DESTINATION_SHARDS}: these endpoints answer 501 while the catalog is sharded: "
+        + ", ".join(local_catalog_only_endpoints())
+    )
+    atexit.register(catalog.close)
+
+def wait_for(url, path, timeout):
+    """
+    Poll a service endpoint until it answers 200 or the timeout passes.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if upstream.session.get(f"{url}{path}", timeout=1).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+def start_services(services, timeout=None):
+    """
+    Start every service in parallel, wait until all of them are serving, warm them up
+    concurrently and wait for their readiness probes. Returns the server threads.
+    """
+    timeout = timeout or Config.STARTUP_TIMEOUT
+    started = time.perf_counter()
     threads = [
-        threading.Thread(target=run_app, args=(user_app, 5000), daemon=True),
-        threading.Thread(target=run_app, args=(auth_app, 5001), daemon=True),
-        threading.Thread(target=run_app, args=(destination_app, 5002), daemon=True)
+        threading.Thread(target=run_app, args=(app, url, options), daemon=True)
+        for app, url, options in services
     ]
-
     for thread in threads:
         thread.start()
 
+    with ThreadPoolExecutor(max_workers=len(services)) as pool:
+        # Warm-ups call other services, so every server has to be up before any of them starts
+        live = list(pool.map(lambda service: wait_for(service[1], "/healthz", timeout), services))
+        if not all(live):
+            down = [url for (_, url, _), up in zip(services, live) if not up]
+            logging.error(f"Services at {down} did not start within {timeout}s")
+            return threads
+        list(pool.map(lambda service: service[0].extensions["readiness"].warm_up_until_ready(), services))
+        ready = list(pool.map(lambda service: wait_for(service[1], "/readyz", timeout), services))
+
+    elapsed = time.perf_counter() - started
+    if all(ready):
+        logging.info(f"All services ready in {elapsed:.2f}s", extra={"fields": {"startup_seconds": round(elapsed, 3)}})
+    else:
+        logging.error(f"Services not ready after {elapsed:.2f}s")
+    return threads
+
+if __name__ == '__main__':
+    destination_options = None
+    if Config.DESTINATION_SHARDS > 1:
+        if Config.DESTINATION_PROCESSES > 1:
+            logging.warning("DESTINATION_PROCESSES is ignored when DESTINATION_SHARDS is set")
+        shard_destination_catalog()
+    elif Config.DESTINATION_PROCESSES > 1:
+        share_destination_catalog()
+        destination_options = {"threaded": False, "processes": Config.DESTINATION_PROCESSES}
+    if Config.DESTINATION_CATALOG_FILE:
+        CatalogFileWatcher(Config.DESTINATION_CATALOG_FILE).start()
+
+    threads = start_services([
+        (user_app, Config.USER_SERVICE_URL, None),
+        (auth_app, Config.AUTH_SERVICE_URL, None),
+        (destination_app, Config.DESTINATION_SERVICE_URL, destination_options),
+    ])
+
     for thread in threads:
         thread.join()
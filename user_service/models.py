@@ -1,3 +1,5 @@
+import bisect
+import threading
 from werkzeug.security import generate_password_hash
 
 # In-memory storage for user data
@@ -9,4 +11,61 @@ users = {
         "password": generate_password_hash("Master@123"),  # Use a secure password
         "role": "Admin"
     }
-}
\ No newline at end of file
+}
+
+
+class UserIndex:
+    """
+    Sorted email index over all users plus one per role, for prefix search and
+    cursor pagination without scanning the whole user table.
+    """
+
+    def __init__(self, users=None):
+        self._emails = []
+        self._by_role = {}
+        self._lock = threading.Lock()
+        for user in (users or {}).values():
+            self.add(user["email"], user["role"])
+
+    def add(self, email, role):
+        with self._lock:
+            bisect.insort(self._emails, email)
+            bisect.insort(self._by_role.setdefault(role, []), email)
+
+    def page(self, prefix="", role=None, after=None, limit=50):
+        """
+        Return up to `limit` emails starting with `prefix` (optionally only `role`),
+        in order, strictly after the email `after`. The second value is the cursor
+        for the next page, or None on the last page.
+        """
+        with self._lock:
+            emails = self._emails if role is None else self._by_role.get(role, [])
+            start = bisect.bisect_left(emails, prefix)
+            if after is not None:
+                start = max(start, bisect.bisect_right(emails, after))
+            page = []
+            for email in emails[start:start + limit + 1]:
+                if not email.startswith(prefix):
+                    break
+                page.append(email)
+        if len(page) > limit:
+            return page[:limit], page[limit - 1]
+        return page, None
+
+
+user_index = UserIndex(users)
+
+
+_users_lock = threading.Lock()
+
+
+def add_user(user):
+    """
+    Add a user to the user table and the index together. Returns False if the email is taken.
+    """
+    with _users_lock:
+        if user["email"] in users:
+            return False
+        users[user["email"]] = user
+        user_index.add(user["email"], user["role"])
+    return True
@@ -1,12 +1,16 @@
+import base64
+import binascii
 from flask import request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-import requests
-from . import app
-from .models import users
+from shared import tracing, upstream
+from shared.config import Config
+from shared.singleflight import token_validations
+from . import app, readiness
+from .models import add_user, users, user_index
 
 current_token = None
 
-AUTH_SERVICE_URL = "http://localhost:5001"
+AUTH_SERVICE_URL = Config.AUTH_SERVICE_URL
 
 @app.route("/")
 def home():
@@ -72,6 +76,8 @@ def register():
             message:
               type: string
               example: "Forbidden Action: Not Logged in as Admin"         
+      503:
+        description: Authentication service unavailable
     """
 
     role = None
@@ -79,7 +85,10 @@ def register():
     if current_token:
         current_token = current_token.replace("Bearer ", "")
         # Validate token via Authentication Service
-        response = requests.get(f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {current_token}"})
+        try:
+            response = token_validations.do(current_token, upstream.call, "auth", "get", f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {current_token}"})
+        except upstream.UpstreamUnavailable:
+            return jsonify({"message": "Authentication service unavailable"}), 503
         if response.status_code != 200:
             return jsonify({"message": "Invalid or expired token"}), 401
 
@@ -93,6 +102,8 @@ def register():
 
     if not all(field in data for field in required_fields):
         return jsonify({"message": "Missing required fields"}), 400
+    if not all(isinstance(data[field], str) for field in required_fields):
+        return jsonify({"message": "name, email, password and role must be strings"}), 400
 
     # Prevent duplicate user creation
     email = data["email"]
@@ -105,12 +116,17 @@ def register():
             return jsonify({"message": "Only admins can create admin accounts"}), 403
 
     # Create the new user
-    users[email] = {
+    with tracing.span("generate_password_hash"):
+        password_hash = generate_password_hash(data["password"])
+    user = {
         "name": data["name"],
         "email": email,
-        "password": generate_password_hash(data["password"]),
+        "password": password_hash,
         "role": data["role"]
     }
+    # Checked again under the lock: another registration may have taken the email meanwhile
+    if not add_user(user):
+        return jsonify({"message": "User already exists"}), 400
 
     return jsonify({"message": "User registered successfully"}), 201
 
@@ -167,6 +183,8 @@ def login():
             message:
               type: string
               example: "Invalid email or password"
+      503:
+        description: Authentication service unavailable
     """
     global current_token
     data = request.get_json()
@@ -177,14 +195,21 @@ def login():
         return jsonify({"message": "Email and password are required"}), 400
 
     user = users.get(email)
-    if not user or not check_password_hash(user["password"], password):
+    if not user:
+        return jsonify({"message": "Invalid email or password"}), 401
+    with tracing.span("check_password_hash"):
+        password_ok = check_password_hash(user["password"], password)
+    if not password_ok:
         return jsonify({"message": "Invalid email or password"}), 401
 
     # Request token from the authentication server
-    auth_response = requests.post(f"{AUTH_SERVICE_URL}/generate_token", json={
-        "email": user["email"],
-        "role": user["role"]
-    })
+    try:
+        auth_response = upstream.call("auth", "post", f"{AUTH_SERVICE_URL}/generate_token", json={
+            "email": user["email"],
+            "role": user["role"]
+        })
+    except upstream.UpstreamUnavailable:
+        return jsonify({"message": "Authentication service unavailable"}), 503
 
     if auth_response.status_code == 200:
         # Extract and store the token
@@ -256,16 +281,26 @@ def profile():
             message:
               type: string
               example: "User not found"
+      503:
+        description: Authentication service unavailable
     """
     global current_token
-    if not current_token:
+    # A forwarded bearer token (e.g. from the gateway) wins over the active login token
+    header = request.headers.get("Authorization", "")
+    forwarded = header[len("Bearer "):].strip() if header.startswith("Bearer ") else ""
+    token = forwarded or current_token
+    if not token:
         return jsonify({"message": "Not logged in or token missing"}), 401
 
     # Validate token via Authentication Service
-    response = requests.get(f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {current_token}"})
+    try:
+        response = token_validations.do(token, upstream.call, "auth", "get", f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {token}"})
+    except upstream.UpstreamUnavailable:
+        return jsonify({"message": "Authentication service unavailable"}), 503
 
     if response.status_code != 200:
-        current_token = None  # Clear invalid token
+        if not forwarded:
+            current_token = None  # Clear invalid token
         return jsonify({"message": "Token is invalid"}), 401
 
     user_info = response.json()
@@ -282,6 +317,121 @@ def profile():
     }
 
     return jsonify(filtered_user), 200
+#======================================================/USERS==================================================
+
+USERS_PAGE_LIMIT = 500
+
+def encode_cursor(email):
+    return base64.urlsafe_b64encode(email.encode()).decode()
+
+def decode_cursor(cursor):
+    return base64.urlsafe_b64decode(cursor.encode()).decode()
+
+@app.route("/users", methods=["GET"])
+def list_users():
+    """
+    List users (Admin only)
+    ---
+    tags:
+      - User Service
+    summary: List and search users
+    description: Page through users in email order, optionally filtered by email prefix and role
+    parameters:
+      - in: header
+        name: Authorization
+        description: JWT token
+        required: true
+        type: string
+        default: "Bearer "
+      - in: query
+        name: prefix
+        type: string
+        required: false
+        description: Only emails starting with this prefix
+      - in: query
+        name: role
+        type: string
+        required: false
+        description: Only users with this role
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        default: 50
+        description: Page size (at most 500)
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: next_cursor from the previous page
+    responses:
+      200:
+        description: One page of users
+        schema:
+          type: object
+          properties:
+            users:
+              type: array
+              items:
+                type: object
+                properties:
+                  name:
+                    type: string
+                    example: "John Doe"
+                  email:
+                    type: string
+                    example: "john@example.com"
+                  role:
+                    type: string
+                    example: "User"
+            next_cursor:
+              type: string
+      400:
+        description: Invalid limit or cursor
+      401:
+        description: Not logged in or invalid token
+      403:
+        description: Not logged in as Admin
+      503:
+        description: Authentication service unavailable
+    """
+    global current_token
+    if not current_token:
+        return jsonify({"message": "Not logged in or token missing"}), 401
+
+    try:
+        response = token_validations.do(current_token, upstream.call, "auth", "get", f"{AUTH_SERVICE_URL}/validate", headers={"Authorization": f"Bearer {current_token}"})
+    except upstream.UpstreamUnavailable:
+        return jsonify({"message": "Authentication service unavailable"}), 503
+    if response.status_code != 200:
+        return jsonify({"message": "Token is invalid"}), 401
+    if response.json().get("role") != "Admin":
+        return jsonify({"message": "Only admins can list users"}), 403
+
+    try:
+        limit = int(request.args.get("limit", 50))
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+    except (ValueError, binascii.Error):
+        return jsonify({"message": "Invalid limit or cursor"}), 400
+    if not 1 <= limit <= USERS_PAGE_LIMIT:
+        return jsonify({"message": f"limit must be between 1 and {USERS_PAGE_LIMIT}"}), 400
+
+    emails, last = user_index.page(
+        prefix=request.args.get("prefix", ""), role=request.args.get("role"), after=after, limit=limit
+    )
+    page = [
+        {"name": users[email]["name"], "email": email, "role": users[email]["role"]}
+        for email in emails
+    ]
+    return jsonify({"users": page, "next_cursor": encode_cursor(last) if last else None}), 200
+
+#=======================================================Warm-up==============================================================
+@readiness.add_warmer
+def check_auth_service():
+    # The auth hop must answer before traffic arrives
+    upstream.call("auth", "get", f"{AUTH_SERVICE_URL}/healthz").raise_for_status()
+
 #=======================================================Internal==============================================================
 @app.route("/_internal/get_token", methods=["GET"])
 def _internal_get_token():
@@ -295,4 +445,14 @@ def _internal_get_token():
     if not current_token:
         return jsonify({"message": "No active token"}), 401
 
-    return jsonify({"access_token": current_token}), 200
\ No newline at end of file
+    return jsonify({"access_token": current_token}), 200
+
+@app.route("/_internal/upstreams", methods=["GET"])
+def _internal_upstreams():
+    """
+    Hidden internal endpoint exposing circuit breaker state for operators.
+    """
+    if request.headers.get("X-Internal-Request") != "true":
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return jsonify(upstream.stats()), 200
\ No newline at end of file